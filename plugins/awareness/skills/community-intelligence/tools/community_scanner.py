@@ -1,15 +1,152 @@
 #!/usr/bin/env -S uv run
 """Community intelligence scanner for GitHub, RSS, and Hacker News."""
 
+import asyncio
+import gzip
+import hashlib
 import json
-import subprocess
+import re
 import sys
+import time
 import urllib.request
-from datetime import datetime, timedelta
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+from email.utils import parsedate_to_datetime
+from io import BytesIO
+from pathlib import Path
 from typing import Optional
+from xml.etree.ElementTree import ParseError, iterparse
 
+try:
+    import orjson
 
-def scan_github_issues(repo: str = "anthropics/claude-code", limit: int = 20, label: str = None) -> dict:
+    def dumps(obj) -> str:
+        """Serialize to indented JSON (orjson fast path)."""
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+
+    loads = orjson.loads
+except ImportError:
+    def dumps(obj) -> str:
+        """Serialize to indented JSON (stdlib fallback)."""
+        return json.dumps(obj, indent=2)
+
+    loads = json.loads
+
+# On-disk cache for gh responses: plugin data/cache/github/<sha1(key)>.json
+CACHE_DIR = Path(__file__).parent.parent.parent.parent / 'data' / 'cache' / 'github'
+CACHE_TTL = 300  # seconds
+
+# Fallback item matcher for feeds that aren't well-formed XML
+_ITEM_RE = re.compile(r'<item>.*?<title>([^<]+)</title>.*?</item>', re.DOTALL)
+
+
+async def _run(cmd: list[str], timeout: int) -> tuple[int, bytes]:
+    """Run a command without blocking the event loop. Returns (returncode, stdout).
+
+    stdout is left as bytes so JSON output goes straight to loads().
+    """
+    proc = await asyncio.create_subprocess_exec(
+        *cmd,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE
+    )
+    try:
+        stdout, _ = await asyncio.wait_for(proc.communicate(), timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise TimeoutError(f"{cmd[0]} timed out after {timeout} seconds")
+    return proc.returncode, stdout
+
+
+def _cache_path(key: str) -> Path:
+    return CACHE_DIR / f"{hashlib.sha1(key.encode()).hexdigest()}.json"
+
+
+def _cache_get(key: str, ttl_seconds: int = CACHE_TTL):
+    """Return the cached value for key, or None if missing or expired."""
+    path = _cache_path(key)
+    try:
+        if time.time() - path.stat().st_mtime > ttl_seconds:
+            return None
+        return loads(path.read_bytes())
+    except Exception:
+        return None
+
+
+def _cache_put(key: str, value) -> None:
+    """Store value under key (best effort, atomic replace)."""
+    path = _cache_path(key)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.tmp')
+        tmp.write_text(dumps(value))
+        tmp.replace(path)
+    except Exception:
+        pass
+
+
+async def _gh_json(cmd: list[str], key: str, use_cache: bool = True, timeout: int = 30):
+    """Run a gh command returning JSON, served from the disk cache when fresh.
+
+    Returns the parsed output, or None if gh exits non-zero.
+    """
+    if use_cache:
+        cached = _cache_get(key)
+        if cached is not None:
+            return cached
+
+    returncode, stdout = await _run(cmd, timeout=timeout)
+    if returncode != 0:
+        return None
+
+    value = loads(stdout)
+    _cache_put(key, value)
+    return value
+
+
+def _fetch(url: str, timeout: int = 10) -> bytes:
+    """Blocking HTTP GET returning the raw (gunzipped) body.
+
+    Run via asyncio.to_thread so fetches overlap. Bytes go straight to the
+    JSON/XML parsers, which skips an intermediate str decode.
+    """
+    request = urllib.request.Request(url, headers={'Accept-Encoding': 'gzip'})
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        body = response.read()
+        if response.headers.get('Content-Encoding') == 'gzip':
+            body = gzip.decompress(body)
+        return body
+
+
+def _issues_result(repo: str, issues: list[dict]) -> dict:
+    """Shape `gh issue list --json` output into the scan result."""
+    return {
+        'source': 'GitHub Issues',
+        'repo': repo,
+        'total_found': len(issues),
+        'issues': [{
+            'number': i['number'],
+            'title': i['title'],
+            'labels': [l['name'] for l in i.get('labels', [])],
+            'state': i['state'],
+            'created': i['createdAt'][:10],
+            'url': i['url']
+        } for i in issues]
+    }
+
+
+def _releases_list(releases: list[dict]) -> list[dict]:
+    """Shape `gh release list --json` output into release entries."""
+    return [{
+        'version': r['tagName'],
+        'name': r['name'],
+        'date': r['publishedAt'][:10]
+    } for r in releases]
+
+
+async def scan_github_issues(repo: str = "anthropics/claude-code", limit: int = 20, label: str = None,
+                             use_cache: bool = True) -> dict:
     """Scan GitHub issues using gh CLI."""
     cmd = ["gh", "issue", "list", "-R", repo, "--limit", str(limit),
            "--json", "number,title,labels,state,createdAt,url"]
@@ -18,55 +155,86 @@ def scan_github_issues(repo: str = "anthropics/claude-code", limit: int = 20, la
         cmd.extend(["--label", label])
 
     try:
-        result = subprocess.run(cmd, capture_output=True, text=True, timeout=30)
-        if result.returncode == 0:
-            issues = json.loads(result.stdout)
-            return {
-                'source': 'GitHub Issues',
-                'repo': repo,
-                'total_found': len(issues),
-                'issues': [{
-                    'number': i['number'],
-                    'title': i['title'],
-                    'labels': [l['name'] for l in i.get('labels', [])],
-                    'state': i['state'],
-                    'created': i['createdAt'][:10],
-                    'url': i['url']
-                } for i in issues]
-            }
+        issues = await _gh_json(cmd, f"issues:{repo}:{limit}:{label}", use_cache)
+        if issues is not None:
+            return _issues_result(repo, issues)
     except Exception as e:
         return {'error': str(e)}
 
     return {'error': 'Failed to fetch issues'}
 
 
-def scan_hacker_news(query: str, limit: int = 10) -> dict:
+async def scan_hacker_news(query: str, limit: int = 10) -> dict:
     """Search Hacker News via Algolia API."""
     url = f"https://hn.algolia.com/api/v1/search?query={query.replace(' ', '+')}&tags=story&hitsPerPage={limit}"
 
     try:
-        with urllib.request.urlopen(url, timeout=10) as response:
-            data = json.loads(response.read().decode())
-            hits = data.get('hits', [])
-
-            return {
-                'source': 'Hacker News',
-                'query': query,
-                'stories_found': len(hits),
-                'total_hits': data.get('nbHits', 0),
-                'stories': [{
-                    'title': h['title'],
-                    'points': h.get('points', 0),
-                    'comments': h.get('num_comments', 0),
-                    'url': f"https://news.ycombinator.com/item?id={h['objectID']}",
-                    'date': h.get('created_at', '')[:10]
-                } for h in hits]
-            }
+        data = loads(await asyncio.to_thread(_fetch, url))
+        hits = data.get('hits', [])
+
+        return {
+            'source': 'Hacker News',
+            'query': query,
+            'stories_found': len(hits),
+            'total_hits': data.get('nbHits', 0),
+            'stories': [{
+                'title': h['title'],
+                'points': h.get('points', 0),
+                'comments': h.get('num_comments', 0),
+                'url': f"https://news.ycombinator.com/item?id={h['objectID']}",
+                'date': h.get('created_at', '')[:10]
+            } for h in hits]
+        }
     except Exception as e:
         return {'error': str(e)}
 
 
-def scan_rss_feeds(days: int = 7) -> dict:
+def _fetch_feed(feed_name: str, feed_url: str, cutoff: datetime) -> list[dict]:
+    """Fetch one RSS feed and return its recent Claude-related items."""
+    content = _fetch(feed_url)
+
+    # Nothing to report if the feed never mentions Claude; skip parsing
+    if b'claude' not in content.lower():
+        return []
+
+    # Stream the XML and stop after the first few items
+    titles = []
+    try:
+        for _, elem in iterparse(BytesIO(content), events=('end',)):
+            if not elem.tag.endswith('item'):
+                continue
+
+            title = elem.findtext('title') or ''
+            pub_date = elem.findtext('pubDate')
+            elem.clear()
+
+            if pub_date:
+                try:
+                    if parsedate_to_datetime(pub_date) < cutoff:
+                        continue
+                except (TypeError, ValueError):
+                    pass
+
+            titles.append(title)
+            if len(titles) >= 5:
+                break
+    except ParseError:
+        # Malformed feed: fall back to pulling titles out with a regex
+        titles = _ITEM_RE.findall(content.decode(errors='replace'))[:5]
+
+    results = []
+    for title in titles:
+        # Check if Claude Code related
+        if 'claude' in title.lower():
+            results.append({
+                'feed': feed_name,
+                'title': title.strip(),
+                'relevance': 0.8 if 'claude code' in title.lower() else 0.5
+            })
+    return results
+
+
+async def scan_rss_feeds(days: int = 7) -> dict:
     """Check RSS feeds for recent updates."""
     feeds = [
         ('anthropic_news', 'https://www.anthropic.com/news/rss.xml'),
@@ -79,32 +247,38 @@ def scan_rss_feeds(days: int = 7) -> dict:
         'items': []
     }
 
-    cutoff = datetime.now() - timedelta(days=days)
-
-    for feed_name, feed_url in feeds:
-        try:
-            with urllib.request.urlopen(feed_url, timeout=10) as response:
-                content = response.read().decode()
+    cutoff = datetime.now(timezone.utc) - timedelta(days=days)
 
-                # Simple XML parsing for titles and dates
-                import re
-                items = re.findall(r'<item>.*?<title>([^<]+)</title>.*?</item>', content, re.DOTALL)
+    # Fetch and parse each feed on its own worker thread
+    loop = asyncio.get_running_loop()
+    with ThreadPoolExecutor(max_workers=len(feeds)) as executor:
+        feed_items = await asyncio.gather(
+            *(loop.run_in_executor(executor, _fetch_feed, feed_name, feed_url, cutoff)
+              for feed_name, feed_url in feeds),
+            return_exceptions=True
+        )
 
-                for title in items[:5]:
-                    # Check if Claude Code related
-                    if 'claude' in title.lower():
-                        results['items'].append({
-                            'feed': feed_name,
-                            'title': title.strip(),
-                            'relevance': 0.8 if 'claude code' in title.lower() else 0.5
-                        })
-        except Exception as e:
-            results[f'{feed_name}_error'] = str(e)
+    for (feed_name, _), items in zip(feeds, feed_items):
+        if isinstance(items, BaseException):
+            results[f'{feed_name}_error'] = str(items)
+        else:
+            results['items'].extend(items)
 
     return results
 
 
-def get_releases() -> dict:
+async def _current_version() -> Optional[str]:
+    """Get the installed Claude Code version, if the CLI is available."""
+    try:
+        returncode, stdout = await _run(["claude", "--version"], timeout=10)
+        if returncode == 0:
+            return stdout.decode().strip()
+    except Exception:
+        pass
+    return None
+
+
+async def get_releases(use_cache: bool = True) -> dict:
     """Get Claude Code release information."""
     result = {
         'source': 'Releases',
@@ -112,41 +286,105 @@ def get_releases() -> dict:
         'releases': []
     }
 
-    # Get current version
-    try:
-        version_result = subprocess.run(
-            ["claude", "--version"],
-            capture_output=True,
-            text=True,
-            timeout=10
-        )
-        if version_result.returncode == 0:
-            result['current_version'] = version_result.stdout.strip()
-    except:
-        pass
+    # Current version and recent GitHub releases are fetched concurrently
+    result['current_version'], gh_result = await asyncio.gather(
+        _current_version(),
+        _gh_json(["gh", "release", "list", "-R", "anthropics/claude-code", "--limit", "5",
+                  "--json", "tagName,publishedAt,name"],
+                 "releases:anthropics/claude-code:5", use_cache),
+        return_exceptions=True
+    )
 
     # Get recent releases from GitHub
     try:
-        gh_result = subprocess.run(
-            ["gh", "release", "list", "-R", "anthropics/claude-code", "--limit", "5",
-             "--json", "tagName,publishedAt,name"],
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
-        if gh_result.returncode == 0:
-            releases = json.loads(gh_result.stdout)
-            result['releases'] = [{
-                'version': r['tagName'],
-                'name': r['name'],
-                'date': r['publishedAt'][:10]
-            } for r in releases]
+        if isinstance(gh_result, BaseException):
+            raise gh_result
+        if gh_result is not None:
+            result['releases'] = _releases_list(gh_result)
     except Exception as e:
         result['releases_error'] = str(e)
 
     return result
 
 
+async def _gh_issues_and_releases(repo: str, limit: int, label: str = None,
+                                  use_cache: bool = True) -> dict | None:
+    """Fetch open issues and recent releases with a single `gh api graphql` call.
+
+    Nodes are reshaped to match `gh issue list` / `gh release list` JSON so
+    the usual formatters apply. Returns None if gh exits non-zero.
+    """
+    owner, name = repo.split('/', 1)
+    label_var = ', $label: String!' if label else ''
+    label_arg = ', labels: [$label]' if label else ''
+    query = f"""query($owner: String!, $name: String!, $limit: Int!{label_var}) {{
+  repository(owner: $owner, name: $name) {{
+    issues(first: $limit, states: OPEN, orderBy: {{field: CREATED_AT, direction: DESC}}{label_arg}) {{
+      nodes {{ number title state createdAt url labels(first: 20) {{ nodes {{ name }} }} }}
+    }}
+    releases(first: 5, orderBy: {{field: CREATED_AT, direction: DESC}}) {{
+      nodes {{ tagName publishedAt name }}
+    }}
+  }}
+}}"""
+    cmd = ["gh", "api", "graphql", "-f", f"query={query}",
+           "-f", f"owner={owner}", "-f", f"name={name}", "-F", f"limit={limit}"]
+    if label:
+        cmd.extend(["-f", f"label={label}"])
+
+    data = await _gh_json(cmd, f"graphql:{repo}:{limit}:{label}", use_cache)
+    if data is None:
+        return None
+
+    repository = data['data']['repository']
+    return {
+        'issues': [
+            {**i, 'labels': i.get('labels', {}).get('nodes', [])}
+            for i in repository['issues']['nodes']
+        ],
+        'releases': repository['releases']['nodes']
+    }
+
+
+async def scan_all(use_cache: bool = True) -> dict:
+    """Run every scan concurrently.
+
+    Issues and releases share one GraphQL request instead of two gh spawns.
+    """
+    repo = "anthropics/claude-code"
+    gh_data, hacker_news, rss, current_version = await asyncio.gather(
+        _gh_issues_and_releases(repo, limit=10, use_cache=use_cache),
+        scan_hacker_news("claude code", 5),
+        scan_rss_feeds(7),
+        _current_version(),
+        return_exceptions=True
+    )
+
+    releases = {
+        'source': 'Releases',
+        'current_version': current_version,
+        'releases': []
+    }
+    try:
+        if isinstance(gh_data, BaseException):
+            raise gh_data
+        if gh_data is None:
+            github = {'error': 'Failed to fetch issues'}
+        else:
+            github = _issues_result(repo, gh_data['issues'])
+            releases['releases'] = _releases_list(gh_data['releases'])
+    except Exception as e:
+        github = {'error': str(e)}
+        releases['releases_error'] = str(e)
+
+    return {
+        'github': github,
+        'hacker_news': hacker_news,
+        'rss': rss,
+        'releases': releases
+    }
+
+
 def main():
     if len(sys.argv) < 2:
         print("Usage: community_scanner.py <command> [args]")
@@ -156,9 +394,12 @@ def main():
         print("  rss [--days N]                         - Check RSS feeds")
         print("  releases                               - Get release info")
         print("  all                                    - Run all scans")
+        print("Options:")
+        print("  --no-cache                             - Bypass the GitHub response cache")
         sys.exit(1)
 
     command = sys.argv[1]
+    use_cache = "--no-cache" not in sys.argv
 
     if command == "github-issues":
         limit = 20
@@ -169,8 +410,8 @@ def main():
         if "--label" in sys.argv:
             idx = sys.argv.index("--label")
             label = sys.argv[idx + 1]
-        result = scan_github_issues(limit=limit, label=label)
-        print(json.dumps(result, indent=2))
+        result = asyncio.run(scan_github_issues(limit=limit, label=label, use_cache=use_cache))
+        print(dumps(result))
 
     elif command == "hacker-news" and len(sys.argv) > 2:
         query = sys.argv[2]
@@ -178,29 +419,24 @@ def main():
         if "--limit" in sys.argv:
             idx = sys.argv.index("--limit")
             limit = int(sys.argv[idx + 1])
-        result = scan_hacker_news(query, limit)
-        print(json.dumps(result, indent=2))
+        result = asyncio.run(scan_hacker_news(query, limit))
+        print(dumps(result))
 
     elif command == "rss":
         days = 7
         if "--days" in sys.argv:
             idx = sys.argv.index("--days")
             days = int(sys.argv[idx + 1])
-        result = scan_rss_feeds(days)
-        print(json.dumps(result, indent=2))
+        result = asyncio.run(scan_rss_feeds(days))
+        print(dumps(result))
 
     elif command == "releases":
-        result = get_releases()
-        print(json.dumps(result, indent=2))
+        result = asyncio.run(get_releases(use_cache=use_cache))
+        print(dumps(result))
 
     elif command == "all":
-        results = {
-            'github': scan_github_issues(limit=10),
-            'hacker_news': scan_hacker_news("claude code", 5),
-            'rss': scan_rss_feeds(7),
-            'releases': get_releases()
-        }
-        print(json.dumps(results, indent=2))
+        results = asyncio.run(scan_all(use_cache=use_cache))
+        print(dumps(results))
 
     else:
         print(f"Unknown command: {command}")
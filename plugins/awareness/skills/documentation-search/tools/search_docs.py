@@ -7,6 +7,21 @@ import sys
 from pathlib import Path
 from typing import Optional
 
+try:
+    import orjson
+
+    def dumps(obj) -> str:
+        """Serialize to indented JSON (orjson fast path)."""
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+
+    loads = orjson.loads
+except ImportError:
+    def dumps(obj) -> str:
+        """Serialize to indented JSON (stdlib fallback)."""
+        return json.dumps(obj, indent=2)
+
+    loads = json.loads
+
 
 def find_database() -> Path | None:
     """Find the awareness database."""
@@ -24,10 +39,32 @@ def find_database() -> Path | None:
     return None
 
 
+# One read-only connection per database for the life of the process; the
+# sqlite3 module keeps a per-connection cache of prepared statements, so
+# repeated queries skip re-parsing SQL.
+_connections: dict[str, sqlite3.Connection] = {}
+
+
+def get_connection(db_path: Path) -> sqlite3.Connection:
+    """Get the shared read-only connection for a database."""
+    key = str(db_path)
+    conn = _connections.get(key)
+    if conn is None:
+        # Read-only URI: this tool never writes, so SQLite can skip write locks.
+        # Not immutable=1 - the crawler may still be updating the database.
+        conn = sqlite3.connect(f"{db_path.resolve().as_uri()}?mode=ro", uri=True)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA query_only = 1")
+        conn.execute("PRAGMA cache_size = -65536")  # 64MB page cache
+        conn.execute("PRAGMA mmap_size = 1073741824")  # 1GB mmap window
+        conn.execute("PRAGMA temp_store = MEMORY")
+        _connections[key] = conn
+    return conn
+
+
 def search_fts(db_path: Path, query: str, limit: int = 10) -> list[dict]:
     """Full-text search using FTS5."""
-    conn = sqlite3.connect(str(db_path))
-    conn.row_factory = sqlite3.Row
+    conn = get_connection(db_path)
 
     results = []
     try:
@@ -37,90 +74,99 @@ def search_fts(db_path: Path, query: str, limit: int = 10) -> list[dict]:
                 snippet(content_fts, 1, '>>>', '<<<', '...', 32) as snippet,
                 rank
             FROM content_fts
-            JOIN content c ON content_fts.resource_id = c.resource_id
-            JOIN resources r ON c.resource_id = r.id
+            JOIN resources r ON r.id = content_fts.resource_id
             WHERE content_fts MATCH ?
             ORDER BY rank
             LIMIT ?
         """, (query, limit))
 
-        for row in cursor:
-            url = row['url']
-            # Extract page name from URL
-            page_name = url.split('/')[-1].replace('.md', '')
-            results.append({
-                'url': url,
-                'page': page_name,
-                'snippet': row['snippet'],
-                'relevance': round(1 / (1 - row['rank']), 2) if row['rank'] else 0
-            })
+        # Page name is the last URL segment without its .md suffix
+        results = [{
+            'url': row['url'],
+            'page': row['url'].rpartition('/')[2].removesuffix('.md'),
+            'snippet': row['snippet'],
+            'relevance': round(1 / (1 - row['rank']), 2) if row['rank'] else 0
+        } for row in cursor.fetchall()]
     except Exception as e:
         print(f"Search error: {e}", file=sys.stderr)
 
-    conn.close()
     return results
 
 
 def get_related(db_path: Path, page: str) -> dict:
     """Get pages related to a given page via edges."""
-    conn = sqlite3.connect(str(db_path))
-    conn.row_factory = sqlite3.Row
+    conn = get_connection(db_path)
 
     result = {'page': page, 'incoming': [], 'outgoing': []}
 
     try:
+        # The page lookup is an IN subquery so SQLite resolves the matching
+        # ids once, instead of re-evaluating LIKE for every joined edge row
+
         # Outgoing links
         cursor = conn.execute("""
             SELECT DISTINCT t.url
             FROM edges e
-            JOIN resources s ON e.source_id = s.id
             JOIN resources t ON e.target_id = t.id
-            WHERE s.url LIKE ?
+            WHERE e.source_id IN (SELECT id FROM resources WHERE url LIKE ?)
             LIMIT 20
         """, (f'%{page}%',))
-        result['outgoing'] = [row['url'].split('/')[-1] for row in cursor]
+        result['outgoing'] = [row['url'].rpartition('/')[2] for row in cursor.fetchall()]
 
         # Incoming links
         cursor = conn.execute("""
             SELECT DISTINCT s.url
             FROM edges e
             JOIN resources s ON e.source_id = s.id
-            JOIN resources t ON e.target_id = t.id
-            WHERE t.url LIKE ?
+            WHERE e.target_id IN (SELECT id FROM resources WHERE url LIKE ?)
             LIMIT 20
         """, (f'%{page}%',))
-        result['incoming'] = [row['url'].split('/')[-1] for row in cursor]
+        result['incoming'] = [row['url'].rpartition('/')[2] for row in cursor.fetchall()]
 
     except Exception as e:
         print(f"Related error: {e}", file=sys.stderr)
 
-    conn.close()
     return result
 
 
 def get_examples(db_path: Path, topic: str, limit: int = 5) -> list[dict]:
     """Get code examples related to a topic."""
-    conn = sqlite3.connect(str(db_path))
-    conn.row_factory = sqlite3.Row
+    conn = get_connection(db_path)
 
     examples = []
     try:
+        # Page text is matched through the FTS index rather than a LIKE scan
+        # over every extracted_text: a quoted prefix phrase, restricted to the
+        # page-text column (the one search_fts() snippets), so "hook" still
+        # finds "hooks" but other columns don't match
+        text_column = conn.execute(
+            "SELECT name FROM pragma_table_info('content_fts') WHERE cid = 1"
+        ).fetchone()[0]
+        phrase = (
+            '"' + text_column.replace('"', '""') + '" : "'
+            + topic.replace('"', '""') + '"*'
+        )
         cursor = conn.execute("""
             SELECT r.url, c.code_examples
             FROM content c
             JOIN resources r ON c.resource_id = r.id
             WHERE c.code_examples IS NOT NULL
-            AND (r.url LIKE ? OR c.extracted_text LIKE ?)
+            AND (
+                r.url LIKE ?
+                OR c.resource_id IN (
+                    SELECT resource_id FROM content_fts WHERE content_fts MATCH ?
+                )
+            )
             LIMIT ?
-        """, (f'%{topic}%', f'%{topic}%', limit * 2))
+        """, (f'%{topic}%', phrase, limit * 2))
 
-        for row in cursor:
+        for row in cursor.fetchall():
             if row['code_examples']:
                 try:
-                    code_list = json.loads(row['code_examples'])
+                    code_list = loads(row['code_examples'])
                     for code in code_list[:2]:  # Max 2 per page
                         examples.append({
-                            'source': row['url'].split('/')[-1],
+                            'source': row['url'].rpartition('/')[2],
                             'language': code.get('language', 'unknown'),
                             'code': code.get('code', '')[:500]
                         })
@@ -134,13 +180,12 @@ def get_examples(db_path: Path, topic: str, limit: int = 5) -> list[dict]:
     except Exception as e:
         print(f"Examples error: {e}", file=sys.stderr)
 
-    conn.close()
     return examples
 
 
 def get_stats(db_path: Path) -> dict:
     """Get database statistics."""
-    conn = sqlite3.connect(str(db_path))
+    conn = get_connection(db_path)
 
     stats = {}
     try:
@@ -155,7 +200,6 @@ def get_stats(db_path: Path) -> dict:
     except Exception as e:
         print(f"Stats error: {e}", file=sys.stderr)
 
-    conn.close()
     return stats
 
 
@@ -180,30 +224,30 @@ def main():
         query = sys.argv[2]
         limit = int(sys.argv[3]) if len(sys.argv) > 3 else 10
         results = search_fts(db_path, query, limit)
-        print(json.dumps({
+        print(dumps({
             'query': query,
             'results': len(results),
             'matches': results
-        }, indent=2))
+        }))
 
     elif command == "related" and len(sys.argv) > 2:
         page = sys.argv[2]
         result = get_related(db_path, page)
-        print(json.dumps(result, indent=2))
+        print(dumps(result))
 
     elif command == "examples" and len(sys.argv) > 2:
         topic = sys.argv[2]
         limit = int(sys.argv[3]) if len(sys.argv) > 3 else 5
         examples = get_examples(db_path, topic, limit)
-        print(json.dumps({
+        print(dumps({
             'topic': topic,
             'examples_found': len(examples),
             'examples': examples
-        }, indent=2))
+        }))
 
     elif command == "stats":
         stats = get_stats(db_path)
-        print(json.dumps(stats, indent=2))
+        print(dumps(stats))
 
     else:
         print(f"Unknown command: {command}")
@@ -5,26 +5,111 @@ import json
 import os
 import re
 import sys
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
 from pathlib import Path
 from typing import Any
 
+try:
+    import orjson
 
-def extract_yaml_frontmatter(content: str) -> dict:
-    """Extract YAML frontmatter from markdown content."""
-    if not content.startswith('---'):
+    def dumps(obj) -> str:
+        """Serialize to indented JSON (orjson fast path)."""
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+
+    loads = orjson.loads
+except ImportError:
+    def dumps(obj) -> str:
+        """Serialize to indented JSON (stdlib fallback)."""
+        return json.dumps(obj, indent=2)
+
+    loads = json.loads
+
+
+# Only the frontmatter keys the scanners report; other lines are skipped
+_FM_RE = re.compile(rb'^[ \t]*(name|description|model|color)[ \t]*:[ \t]*(.*?)[ \t\r]*$', re.M)
+
+
+def extract_yaml_frontmatter(content: bytes) -> dict:
+    """Extract known YAML frontmatter keys from raw markdown bytes."""
+    if not content.startswith(b'---'):
         return {}
 
-    end = content.find('---', 3)
+    end = content.find(b'---', 3)
     if end == -1:
         return {}
 
-    frontmatter = content[3:end].strip()
-    result = {}
-    for line in frontmatter.split('\n'):
-        if ':' in line:
-            key, value = line.split(':', 1)
-            result[key.strip()] = value.strip()
-    return result
+    return {
+        key.decode(): value.decode('utf-8', 'replace')
+        for key, value in _FM_RE.findall(content, 3, end)
+    }
+
+
+def _read_frontmatter(path: Path, limit: int = 4096) -> bytes:
+    """Read only the head of a markdown file, enough to cover its frontmatter.
+
+    Falls back to reading the whole file if the closing '---' isn't
+    within the first `limit` bytes.
+    """
+    with open(path, 'rb') as f:
+        head = f.read(limit)
+        if len(head) < limit or not head.startswith(b'---') or head.find(b'---', 3) != -1:
+            return head
+        return head + f.read()
+
+
+def _count_entries(path: str, predicate) -> int:
+    """Count directory entries matching predicate (0 if path isn't a directory)."""
+    try:
+        with os.scandir(path) as it:
+            return sum(1 for entry in it if predicate(entry))
+    except OSError:
+        return 0
+
+
+def _entries(path: str) -> list[os.DirEntry]:
+    """List directory entries (empty if path isn't a directory)."""
+    try:
+        with os.scandir(path) as it:
+            return list(it)
+    except OSError:
+        return []
+
+
+def _subdirs(path: str) -> list[os.DirEntry]:
+    """List subdirectories using the type info cached on each DirEntry."""
+    return [entry for entry in _entries(path) if entry.is_dir()]
+
+
+def _walk_cache(cache_path: Path) -> tuple[list[Path], list[Path], list[Path]]:
+    """Collect plugin skill, agent and hook files in one pass over the cache.
+
+    Descends only marketplace/plugin/version directories and peeks into each
+    version's skills/, agents/ and hooks/, matching the
+    '*/*/*/skills/*/SKILL.md', '*/*/*/agents/*.md' and
+    '*/*/*/hooks/hooks.json' globs without three separate tree walks.
+    """
+    skills, agents, hooks = [], [], []
+    for marketplace in _subdirs(str(cache_path)):
+        for plugin_dir in _subdirs(marketplace.path):
+            for version_dir in _subdirs(plugin_dir.path):
+                base = version_dir.path
+
+                for skill_dir in _subdirs(os.path.join(base, 'skills')):
+                    skill_md = os.path.join(skill_dir.path, 'SKILL.md')
+                    if os.path.exists(skill_md):
+                        skills.append(Path(skill_md))
+
+                agents.extend(
+                    Path(entry.path) for entry in _entries(os.path.join(base, 'agents'))
+                    if entry.name.endswith('.md')
+                )
+
+                hooks_json = os.path.join(base, 'hooks', 'hooks.json')
+                if os.path.exists(hooks_json):
+                    hooks.append(Path(hooks_json))
+
+    return skills, agents, hooks
 
 
 def scan_plugins(cache_path: Path) -> list[dict]:
@@ -35,181 +120,200 @@ def scan_plugins(cache_path: Path) -> list[dict]:
         return plugins
 
     # Structure: cache/marketplace/plugin/version/
-    for marketplace in cache_path.iterdir():
-        if not marketplace.is_dir():
-            continue
-        for plugin_dir in marketplace.iterdir():
-            if not plugin_dir.is_dir():
+    for marketplace in _subdirs(str(cache_path)):
+        for plugin_dir in _subdirs(marketplace.path):
+            # Find version directory (usually just one) - only take the first
+            versions = _subdirs(plugin_dir.path)
+            if not versions:
                 continue
+            version_dir = versions[0]
+            version_path = version_dir.path
+
+            plugin_info = {
+                'name': plugin_dir.name,
+                'marketplace': marketplace.name,
+                'path': version_path,
+                'version': version_dir.name,
+                'skills': 0,
+                'agents': 0,
+                'hooks': 0,
+                'commands': 0
+            }
 
-            # Find version directory (usually just one)
-            for version_dir in plugin_dir.iterdir():
-                if not version_dir.is_dir():
-                    continue
-
-                manifest_path = version_dir / '.claude-plugin' / 'plugin.json'
-                plugin_info = {
-                    'name': plugin_dir.name,
-                    'marketplace': marketplace.name,
-                    'path': str(version_dir),
-                    'version': version_dir.name,
-                    'skills': 0,
-                    'agents': 0,
-                    'hooks': 0,
-                    'commands': 0
-                }
-
-                if manifest_path.exists():
-                    try:
-                        with open(manifest_path) as f:
-                            manifest = json.load(f)
-                            plugin_info['name'] = manifest.get('name', plugin_dir.name)
-                    except:
-                        pass
-
-                # Count components
-                skills_dir = version_dir / 'skills'
-                if skills_dir.exists():
-                    plugin_info['skills'] = len(list(skills_dir.glob('*/SKILL.md')))
-
-                agents_dir = version_dir / 'agents'
-                if agents_dir.exists():
-                    plugin_info['agents'] = len(list(agents_dir.glob('*.md')))
-
-                hooks_file = version_dir / 'hooks' / 'hooks.json'
-                if hooks_file.exists():
-                    plugin_info['hooks'] = 1
-
-                commands_dir = version_dir / 'commands'
-                if commands_dir.exists():
-                    plugin_info['commands'] = len(list(commands_dir.glob('*.md')))
-
-                plugins.append(plugin_info)
-                break  # Only take first version
+            try:
+                with open(os.path.join(version_path, '.claude-plugin', 'plugin.json'), 'rb') as f:
+                    manifest = loads(f.read())
+                    plugin_info['name'] = manifest.get('name', plugin_dir.name)
+            except:
+                pass
+
+            # Count components, one directory stream each
+            plugin_info['skills'] = _count_entries(
+                os.path.join(version_path, 'skills'),
+                lambda e: os.path.exists(os.path.join(e.path, 'SKILL.md'))
+            )
+            plugin_info['agents'] = _count_entries(
+                os.path.join(version_path, 'agents'),
+                lambda e: e.name.endswith('.md')
+            )
+            if os.path.exists(os.path.join(version_path, 'hooks', 'hooks.json')):
+                plugin_info['hooks'] = 1
+            plugin_info['commands'] = _count_entries(
+                os.path.join(version_path, 'commands'),
+                lambda e: e.name.endswith('.md')
+            )
+
+            plugins.append(plugin_info)
 
     return plugins
 
 
-def scan_skills(cache_path: Path, user_skills_path: Path) -> dict:
-    """Scan for all available skills."""
+def _parallel_map(fn, paths: list[Path]) -> list:
+    """Apply fn to each path on a thread pool, preserving input order."""
+    if not paths:
+        return []
+    with ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4)) as executor:
+        return list(executor.map(fn, paths))
+
+
+def _plugin_name(path: Path, cache_path: Path) -> str:
+    """Get plugin name from a cache/marketplace/plugin/version/... path."""
+    try:
+        return path.relative_to(cache_path).parts[1]  # marketplace/plugin/version
+    except (ValueError, IndexError):
+        return 'unknown'
+
+
+def _parse_user_skill(skill_md: Path) -> dict:
+    """Read one user SKILL.md."""
+    skill_dir = skill_md.parent
+    try:
+        content = _read_frontmatter(skill_md)
+        fm = extract_yaml_frontmatter(content)
+        return {
+            'name': fm.get('name', skill_dir.name),
+            'description': fm.get('description', ''),
+            'path': str(skill_dir)
+        }
+    except:
+        return {
+            'name': skill_dir.name,
+            'path': str(skill_dir)
+        }
+
+
+def _parse_plugin_skill(skill_md: Path, cache_path: Path) -> dict:
+    """Read one plugin SKILL.md."""
+    skill_dir = skill_md.parent
+    plugin_name = _plugin_name(skill_md, cache_path)
+    try:
+        content = _read_frontmatter(skill_md)
+        fm = extract_yaml_frontmatter(content)
+        return {
+            'plugin': plugin_name,
+            'name': fm.get('name', skill_dir.name),
+            'description': fm.get('description', '')[:100]
+        }
+    except:
+        return {
+            'plugin': plugin_name,
+            'name': skill_dir.name
+        }
+
+
+def scan_skills(cache_path: Path, user_skills_path: Path,
+                skill_paths: list[Path] | None = None) -> dict:
+    """Scan for all available skills.
+
+    skill_paths: plugin SKILL.md files from _walk_cache (walked here if omitted)
+    """
     result = {'user_skills': [], 'plugin_skills': []}
 
     # User skills
     if user_skills_path.exists():
-        for skill_md in user_skills_path.glob('*/SKILL.md'):
-            skill_dir = skill_md.parent
-            try:
-                content = skill_md.read_text()
-                fm = extract_yaml_frontmatter(content)
-                result['user_skills'].append({
-                    'name': fm.get('name', skill_dir.name),
-                    'description': fm.get('description', ''),
-                    'path': str(skill_dir)
-                })
-            except:
-                result['user_skills'].append({
-                    'name': skill_dir.name,
-                    'path': str(skill_dir)
-                })
+        result['user_skills'] = _parallel_map(
+            _parse_user_skill, list(user_skills_path.glob('*/SKILL.md'))
+        )
 
     # Plugin skills
     if cache_path.exists():
-        for skill_md in cache_path.glob('*/*/*/skills/*/SKILL.md'):
-            skill_dir = skill_md.parent
-            parts = str(skill_md).split('/')
-            # Find plugin name from path
-            try:
-                cache_idx = parts.index('cache')
-                plugin_name = parts[cache_idx + 2]  # marketplace/plugin/version
-            except:
-                plugin_name = 'unknown'
-
-            try:
-                content = skill_md.read_text()
-                fm = extract_yaml_frontmatter(content)
-                result['plugin_skills'].append({
-                    'plugin': plugin_name,
-                    'name': fm.get('name', skill_dir.name),
-                    'description': fm.get('description', '')[:100]
-                })
-            except:
-                result['plugin_skills'].append({
-                    'plugin': plugin_name,
-                    'name': skill_dir.name
-                })
+        if skill_paths is None:
+            skill_paths = _walk_cache(cache_path)[0]
+        result['plugin_skills'] = _parallel_map(
+            partial(_parse_plugin_skill, cache_path=cache_path), skill_paths
+        )
 
     return result
 
 
-def scan_agents(cache_path: Path) -> list[dict]:
-    """Scan for all configured agents."""
-    agents = []
+def _parse_agent(agent_md: Path, cache_path: Path) -> dict:
+    """Read one agent definition."""
+    plugin_name = _plugin_name(agent_md, cache_path)
+    try:
+        content = _read_frontmatter(agent_md)
+        fm = extract_yaml_frontmatter(content)
+        return {
+            'plugin': plugin_name,
+            'name': fm.get('name', agent_md.stem),
+            'model': fm.get('model', 'inherit'),
+            'color': fm.get('color', 'blue')
+        }
+    except:
+        return {
+            'plugin': plugin_name,
+            'name': agent_md.stem
+        }
 
-    if not cache_path.exists():
-        return agents
-
-    for agent_md in cache_path.glob('*/*/*/agents/*.md'):
-        parts = str(agent_md).split('/')
-        try:
-            cache_idx = parts.index('cache')
-            plugin_name = parts[cache_idx + 2]
-        except:
-            plugin_name = 'unknown'
-
-        try:
-            content = agent_md.read_text()
-            fm = extract_yaml_frontmatter(content)
-            agents.append({
-                'plugin': plugin_name,
-                'name': fm.get('name', agent_md.stem),
-                'model': fm.get('model', 'inherit'),
-                'color': fm.get('color', 'blue')
-            })
-        except:
-            agents.append({
-                'plugin': plugin_name,
-                'name': agent_md.stem
-            })
-
-    return agents
-
-
-def scan_hooks(cache_path: Path) -> list[dict]:
-    """Scan for all hook configurations."""
-    hooks = []
 
+def scan_agents(cache_path: Path, agent_paths: list[Path] | None = None) -> list[dict]:
+    """Scan for all configured agents.
+
+    agent_paths: agent markdown files from _walk_cache (walked here if omitted)
+    """
     if not cache_path.exists():
-        return hooks
+        return []
 
-    for hooks_json in cache_path.glob('*/*/*/hooks/hooks.json'):
-        parts = str(hooks_json).split('/')
-        try:
-            cache_idx = parts.index('cache')
-            plugin_name = parts[cache_idx + 2]
-        except:
-            plugin_name = 'unknown'
+    if agent_paths is None:
+        agent_paths = _walk_cache(cache_path)[1]
+    return _parallel_map(partial(_parse_agent, cache_path=cache_path), agent_paths)
 
-        try:
-            with open(hooks_json) as f:
-                config = json.load(f)
 
-            # Handle both formats: {hooks: {...}} and direct {...}
-            hook_events = config.get('hooks', config)
+def _parse_hooks(hooks_json: Path, cache_path: Path) -> dict | None:
+    """Read one hooks.json; None if unreadable or it registers no events."""
+    try:
+        with open(hooks_json) as f:
+            config = loads(f.read())
 
-            events = {}
-            for event, handlers in hook_events.items():
-                if isinstance(handlers, list):
-                    events[event] = len(handlers)
+        # Handle both formats: {hooks: {...}} and direct {...}
+        hook_events = config.get('hooks', config)
 
-            if events:
-                hooks.append({
-                    'plugin': plugin_name,
-                    'events': events
-                })
-        except:
-            pass
+        events = {}
+        for event, handlers in hook_events.items():
+            if isinstance(handlers, list):
+                events[event] = len(handlers)
 
-    return hooks
+        if events:
+            return {
+                'plugin': _plugin_name(hooks_json, cache_path),
+                'events': events
+            }
+    except:
+        pass
+    return None
+
+
+def scan_hooks(cache_path: Path, hook_paths: list[Path] | None = None) -> list[dict]:
+    """Scan for all hook configurations.
+
+    hook_paths: hooks.json files from _walk_cache (walked here if omitted)
+    """
+    if not cache_path.exists():
+        return []
+
+    if hook_paths is None:
+        hook_paths = _walk_cache(cache_path)[2]
+    parsed = _parallel_map(partial(_parse_hooks, cache_path=cache_path), hook_paths)
+    return [h for h in parsed if h]
 
 
 def main():
@@ -221,17 +325,22 @@ def main():
 
     result = {}
 
+    # One traversal of the cache feeds the skill, agent and hook scans
+    skill_paths = agent_paths = hook_paths = None
+    if scan_type in ['all', 'skills', 'agents', 'hooks']:
+        skill_paths, agent_paths, hook_paths = _walk_cache(cache_path)
+
     if scan_type in ['all', 'plugins']:
         result['plugins'] = scan_plugins(cache_path)
 
     if scan_type in ['all', 'skills']:
-        result['skills'] = scan_skills(cache_path, user_skills_path)
+        result['skills'] = scan_skills(cache_path, user_skills_path, skill_paths)
 
     if scan_type in ['all', 'agents']:
-        result['agents'] = scan_agents(cache_path)
+        result['agents'] = scan_agents(cache_path, agent_paths)
 
     if scan_type in ['all', 'hooks']:
-        result['hooks'] = scan_hooks(cache_path)
+        result['hooks'] = scan_hooks(cache_path, hook_paths)
 
     # Summary
     if scan_type == 'all':
@@ -243,7 +352,7 @@ def main():
             'total_hooks': sum(len(h.get('events', {})) for h in result.get('hooks', []))
         }
 
-    print(json.dumps(result, indent=2))
+    print(dumps(result))
 
 
 if __name__ == "__main__":
@@ -1,29 +1,112 @@
 #!/usr/bin/env -S uv run
 """YouTube transcript extraction and channel crawling tool."""
 
+import asyncio
+import io
 import json
+import os
+import re
 import subprocess
 import sys
+import threading
 from pathlib import Path
 from typing import Optional
 
+try:
+    import orjson
+
+    def dumps(obj) -> str:
+        """Serialize to indented JSON (orjson fast path)."""
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS).decode()
+
+    loads = orjson.loads
+except ImportError:
+    def dumps(obj) -> str:
+        """Serialize to indented JSON (stdlib fallback)."""
+        return json.dumps(obj, indent=2)
+
+    loads = json.loads
+
+try:
+    from yt_dlp import YoutubeDL
+except ImportError:
+    YoutubeDL = None  # Fall back to the yt-dlp CLI
+
+
+_YDL_BASE_OPTS = {'quiet': True, 'no_warnings': True, 'skip_download': True, 'socket_timeout': 30}
+_ydl_local = threading.local()
+
+_VTT_TAG_RE = re.compile(rb'<[^>]+>')
+# Headers, position/style tags
+_VTT_SKIP_PREFIXES = (b'WEBVTT', b'<', b'align:')
+
+
+def _ydl(**opts) -> "YoutubeDL":
+    """Get a reusable in-process YoutubeDL for these options (one per thread)."""
+    instances = _ydl_local.__dict__.setdefault('instances', {})
+    key = repr(sorted(opts.items()))
+    ydl = instances.get(key)
+    if ydl is None:
+        ydl = instances[key] = YoutubeDL({**_YDL_BASE_OPTS, **opts})
+    return ydl
+
+
+def _yt_dlp_cli(args: list[str], timeout: int) -> list[dict]:
+    """Run the yt-dlp CLI and parse each line of its --dump-json output."""
+    result = subprocess.run(
+        ["yt-dlp", "--dump-json", "--no-download", *args],
+        capture_output=True,
+        timeout=timeout
+    )
+    entries = []
+    if result.returncode == 0:
+        for line in result.stdout.splitlines():
+            if line:
+                try:
+                    entries.append(loads(line))
+                except json.JSONDecodeError:
+                    continue
+    return entries
+
+
+def _list_entries(url: str, limit: Optional[int] = None, timeout: int = 30) -> list[dict]:
+    """List the videos of a search or playlist URL without resolving each one."""
+    if YoutubeDL is not None:
+        info = _ydl(extract_flat='in_playlist', playlistend=limit).extract_info(url, download=False)
+        return list(info.get('entries') or []) if info else []
+    args = ["--flat-playlist"]
+    if limit:
+        args += ["--playlist-end", str(limit)]
+    return _yt_dlp_cli(args + [url], timeout)
+
 
 def get_video_info(url: str) -> dict | None:
     """Get video metadata without downloading."""
     try:
-        result = subprocess.run(
-            ["yt-dlp", "--dump-json", "--no-download", url],
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
-        if result.returncode == 0:
-            return json.loads(result.stdout)
+        if YoutubeDL is not None:
+            return _ydl().extract_info(url, download=False)
+        entries = _yt_dlp_cli([url], timeout=30)
+        if entries:
+            return entries[0]
     except Exception as e:
         print(f"Error getting video info: {e}", file=sys.stderr)
     return None
 
 
+# output_dir -> video IDs with a cached transcript, scanned once per process
+_transcript_index: dict[Path, set[str]] = {}
+
+
+def _cached_transcript_ids(output_dir: Path) -> set[str]:
+    """Get the video IDs that already have a transcript in output_dir."""
+    ids = _transcript_index.get(output_dir)
+    if ids is None:
+        with os.scandir(output_dir) as entries:
+            ids = {entry.name[:-4] for entry in entries if entry.name.endswith('.txt')}
+        ids = _transcript_index.setdefault(output_dir, ids)
+    return ids
+
+
 def extract_transcript(url: str, output_dir: Path) -> dict | None:
     """Extract transcript from a YouTube video."""
     output_dir.mkdir(parents=True, exist_ok=True)
@@ -40,8 +123,14 @@ def extract_transcript(url: str, output_dir: Path) -> dict | None:
 
     # Check cache
     cache_file = output_dir / f"{video_id}.txt"
-    if cache_file.exists():
-        text = cache_file.read_text()
+    cached_ids = _cached_transcript_ids(output_dir)
+    text = None
+    if video_id in cached_ids:
+        try:
+            text = cache_file.read_text()
+        except FileNotFoundError:
+            cached_ids.discard(video_id)
+    if text is not None:
         return {
             'video_id': video_id,
             'title': title,
@@ -55,20 +144,29 @@ def extract_transcript(url: str, output_dir: Path) -> dict | None:
 
     # Extract subtitles
     try:
-        result = subprocess.run(
-            [
-                "yt-dlp",
-                "--skip-download",
-                "--write-auto-sub",
-                "--sub-lang", "en",
-                "--sub-format", "vtt",
-                "-o", str(output_dir / "%(id)s.%(ext)s"),
-                url
-            ],
-            capture_output=True,
-            text=True,
-            timeout=60
-        )
+        outtmpl = str(output_dir / "%(id)s.%(ext)s")
+        if YoutubeDL is not None:
+            _ydl(
+                writeautomaticsub=True,
+                subtitleslangs=['en'],
+                subtitlesformat='vtt',
+                outtmpl=outtmpl
+            ).extract_info(url, download=True)
+        else:
+            subprocess.run(
+                [
+                    "yt-dlp",
+                    "--skip-download",
+                    "--write-auto-sub",
+                    "--sub-lang", "en",
+                    "--sub-format", "vtt",
+                    "-o", outtmpl,
+                    url
+                ],
+                capture_output=True,
+                text=True,
+                timeout=60
+            )
 
         # Find and parse VTT file
         vtt_file = output_dir / f"{video_id}.en.vtt"
@@ -76,6 +174,7 @@ def extract_transcript(url: str, output_dir: Path) -> dict | None:
             text = parse_vtt(vtt_file)
             # Save as plain text
             cache_file.write_text(text)
+            cached_ids.add(video_id)
             # Clean up VTT
             vtt_file.unlink()
 
@@ -98,63 +197,66 @@ def extract_transcript(url: str, output_dir: Path) -> dict | None:
     return None
 
 
+async def extract_transcripts_batch(urls: list[str], output_dir: Path, concurrency: int = 8) -> list[dict]:
+    """Extract transcripts for many videos concurrently."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def _one(url: str) -> dict | None:
+        async with semaphore:
+            return await asyncio.to_thread(extract_transcript, url, output_dir)
+
+    urls = list(dict.fromkeys(urls))
+    results = await asyncio.gather(*[_one(url) for url in urls], return_exceptions=True)
+
+    batch = []
+    for url, result in zip(urls, results):
+        if isinstance(result, Exception):
+            batch.append({'url': url, 'error': str(result)})
+        elif result is None:
+            batch.append({'url': url, 'error': 'Failed to extract transcript'})
+        else:
+            batch.append({'url': url, **result})
+    return batch
+
+
 def parse_vtt(vtt_path: Path) -> str:
     """Parse VTT subtitles into clean text."""
-    lines = []
-    prev_line = ""
+    buf = io.StringIO()
+    sep = ""
+    prev_line = b""
 
-    with open(vtt_path) as f:
+    # Work on bytes and only decode the lines that are kept
+    with open(vtt_path, "rb", buffering=1 << 20) as f:
         for line in f:
             line = line.strip()
-            # Skip headers, timestamps, and empty lines
-            if line.startswith("WEBVTT") or "-->" in line or not line:
-                continue
-            # Skip position/style tags
-            if line.startswith('<') or line.startswith('align:'):
+            # Skip empty lines, timestamps, headers, and position/style tags
+            if not line or b"-->" in line or line.startswith(_VTT_SKIP_PREFIXES):
                 continue
             # Clean inline tags
-            import re
-            line = re.sub(r'<[^>]+>', '', line)
+            line = _VTT_TAG_RE.sub(b'', line)
             # Deduplicate
             if line and line != prev_line:
-                lines.append(line)
+                buf.write(sep)
+                buf.write(line.decode('utf-8', 'replace'))
+                sep = " "
                 prev_line = line
 
-    return " ".join(lines)
+    return buf.getvalue()
 
 
 def search_videos(query: str, limit: int = 5) -> list[dict]:
     """Search YouTube for videos matching a query."""
     try:
-        result = subprocess.run(
-            [
-                "yt-dlp",
-                "--dump-json",
-                "--flat-playlist",
-                "--no-download",
-                f"ytsearch{limit}:{query}"
-            ],
-            capture_output=True,
-            text=True,
-            timeout=30
-        )
-
-        videos = []
-        if result.returncode == 0:
-            for line in result.stdout.strip().split('\n'):
-                if line:
-                    try:
-                        video = json.loads(line)
-                        videos.append({
-                            'id': video.get('id'),
-                            'title': video.get('title', ''),
-                            'channel': video.get('channel', video.get('uploader', '')),
-                            'duration': video.get('duration_string', ''),
-                            'url': f"https://www.youtube.com/watch?v={video.get('id')}"
-                        })
-                    except json.JSONDecodeError:
-                        continue
-        return videos
+        return [
+            {
+                'id': video.get('id'),
+                'title': video.get('title', ''),
+                'channel': video.get('channel', video.get('uploader', '')),
+                'duration': video.get('duration_string', ''),
+                'url': f"https://www.youtube.com/watch?v={video.get('id')}"
+            }
+            for video in _list_entries(f"ytsearch{limit}:{query}")
+        ]
 
     except Exception as e:
         print(f"Error searching: {e}", file=sys.stderr)
@@ -171,34 +273,15 @@ def crawl_channel(channel_url: str, limit: int = 10) -> dict:
             channel_url = f"https://www.youtube.com/@{channel_url}/videos"
 
     try:
-        result = subprocess.run(
-            [
-                "yt-dlp",
-                "--dump-json",
-                "--flat-playlist",
-                "--no-download",
-                "--playlist-end", str(limit),
-                channel_url
-            ],
-            capture_output=True,
-            text=True,
-            timeout=60
-        )
-
-        videos = []
-        if result.returncode == 0:
-            for line in result.stdout.strip().split('\n'):
-                if line:
-                    try:
-                        video = json.loads(line)
-                        videos.append({
-                            'id': video.get('id'),
-                            'title': video.get('title', ''),
-                            'duration': video.get('duration_string', ''),
-                            'url': f"https://www.youtube.com/watch?v={video.get('id')}"
-                        })
-                    except json.JSONDecodeError:
-                        continue
+        videos = [
+            {
+                'id': video.get('id'),
+                'title': video.get('title', ''),
+                'duration': video.get('duration_string', ''),
+                'url': f"https://www.youtube.com/watch?v={video.get('id')}"
+            }
+            for video in _list_entries(channel_url, limit, timeout=60)
+        ]
 
         return {
             'channel_url': channel_url,
@@ -211,13 +294,21 @@ def crawl_channel(channel_url: str, limit: int = 10) -> dict:
         return {'channel_url': channel_url, 'videos_found': 0, 'videos': [], 'error': str(e)}
 
 
+async def crawl_channels(channel_urls: list[str], limit: int = 10) -> list[dict]:
+    """Crawl several YouTube channels concurrently."""
+    return await asyncio.gather(*[
+        asyncio.to_thread(crawl_channel, channel_url, limit) for channel_url in channel_urls
+    ])
+
+
 def main():
     if len(sys.argv) < 2:
         print("Usage: youtube_extractor.py <command> [args]")
         print("Commands:")
         print("  transcript <url>          - Extract transcript from video")
+        print("  batch [--urls-file F]     - Extract transcripts for URLs in F (or stdin)")
         print("  search <query> [--limit N] - Search for videos")
-        print("  channel <url> [--limit N]  - Crawl channel for videos")
+        print("  channel <url>... [--limit N] - Crawl one or more channels for videos")
         print("  info <url>                - Get video info")
         sys.exit(1)
 
@@ -231,11 +322,25 @@ def main():
         url = sys.argv[2]
         result = extract_transcript(url, output_dir)
         if result:
-            print(json.dumps(result, indent=2))
+            print(dumps(result))
         else:
             print(json.dumps({'error': 'Failed to extract transcript'}))
             sys.exit(1)
 
+    elif command == "batch":
+        if "--urls-file" in sys.argv:
+            idx = sys.argv.index("--urls-file")
+            source = Path(sys.argv[idx + 1]).read_text() if idx + 1 < len(sys.argv) else ""
+        else:
+            source = sys.stdin.read()
+        urls = [line.strip() for line in source.splitlines() if line.strip()]
+        results = asyncio.run(extract_transcripts_batch(urls, output_dir))
+        print(dumps({
+            'requested': len(results),
+            'extracted': sum(1 for r in results if 'error' not in r),
+            'results': results
+        }))
+
     elif command == "search" and len(sys.argv) > 2:
         query = sys.argv[2]
         limit = 5
@@ -244,29 +349,33 @@ def main():
             if idx + 1 < len(sys.argv):
                 limit = int(sys.argv[idx + 1])
         results = search_videos(query, limit)
-        print(json.dumps({'query': query, 'results': len(results), 'videos': results}, indent=2))
+        print(dumps({'query': query, 'results': len(results), 'videos': results}))
 
     elif command == "channel" and len(sys.argv) > 2:
-        channel = sys.argv[2]
+        channels = sys.argv[2:]
         limit = 10
         if "--limit" in sys.argv:
             idx = sys.argv.index("--limit")
             if idx + 1 < len(sys.argv):
                 limit = int(sys.argv[idx + 1])
-        result = crawl_channel(channel, limit)
-        print(json.dumps(result, indent=2))
+            channels = sys.argv[2:idx] + sys.argv[idx + 2:]
+        if len(channels) == 1:
+            result = crawl_channel(channels[0], limit)
+        else:
+            result = {'channels': asyncio.run(crawl_channels(channels, limit))}
+        print(dumps(result))
 
     elif command == "info" and len(sys.argv) > 2:
         url = sys.argv[2]
         info = get_video_info(url)
         if info:
-            print(json.dumps({
+            print(dumps({
                 'id': info.get('id'),
                 'title': info.get('title'),
                 'channel': info.get('channel', info.get('uploader')),
                 'duration': info.get('duration_string'),
                 'description': info.get('description', '')[:500]
-            }, indent=2))
+            }))
         else:
             print(json.dumps({'error': 'Failed to get video info'}))
             sys.exit(1)
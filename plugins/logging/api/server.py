@@ -4,17 +4,22 @@ FastAPI Server for Logging Plugin
 Provides REST API for search, statistics, and real-time updates.
 """
 
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse, FileResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import StreamingResponse, FileResponse, ORJSONResponse, Response
 from pydantic import BaseModel
 from typing import Optional, List
 from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
 import asyncio
-import json
+import hashlib
+import mmap
+import orjson
 import os
-import mimetypes
+import time
 import re
+import threading
 
 # Add parent to path for imports
 import sys
@@ -22,14 +27,23 @@ sys.path.insert(0, str(Path(__file__).parent.parent))
 
 from lib.storage import StorageManager
 from lib.search import SearchService
-from lib.embeddings import EmbeddingService, EmbeddingStorage
+from lib.embeddings import EmbeddingService, FaissEmbeddingStorage
 
 
 # Configuration
+PROJECT_DIR = Path(os.environ.get("CLAUDE_PROJECT_DIR", os.getcwd()))
 STORAGE_PATH = Path(os.environ.get(
     "LOGGING_STORAGE_PATH",
-    os.path.join(os.environ.get("CLAUDE_PROJECT_DIR", os.getcwd()), ".claude/local/logging")
+    os.path.join(PROJECT_DIR, ".claude/local/logging")
 ))
+RESPONSE_CACHE_TTL = 5  # seconds
+RESPONSE_CACHE_SIZE = 128
+IMAGE_PATH_CACHE_SIZE = 4096
+SUBAGENT_TRANSCRIPT_CACHE_SIZE = 1024
+ENCODE_TIMEOUT = 10  # seconds a search waits for its query embedding
+# Internal nginx location mapped to STORAGE_PATH. When set, /api/images answers with an
+# X-Accel-Redirect header and nginx sends the file itself (sendfile, no Python in the path).
+IMAGES_ACCEL_REDIRECT = os.environ.get("LOGGING_IMAGES_ACCEL_REDIRECT")
 
 
 class EmbeddingManager:
@@ -39,7 +53,8 @@ class EmbeddingManager:
     """
     def __init__(self, storage_path: Path):
         self.service = EmbeddingService()
-        self.storage = EmbeddingStorage(storage_path / "embeddings.db")
+        # Exact search for small stores, FAISS IVF-PQ for large ones (if installed)
+        self.storage = FaissEmbeddingStorage(storage_path / "embeddings.db")
         self._available = self.service.is_available
 
     @property
@@ -47,8 +62,33 @@ class EmbeddingManager:
         return self._available
 
     def encode(self, texts):
-        """Encode texts using the embedding service."""
-        return self.service.encode(texts)
+        """
+        Encode texts using the embedding service.
+
+        Returns None when encoding fails or times out, so search falls back
+        to keyword results.
+        """
+        if len(texts) != 1:
+            try:
+                embeddings = self.service.encode(texts)
+            except Exception:
+                return None
+            return embeddings if len(embeddings) else None
+
+        # Single queries go through the batching worker, so concurrent
+        # searches share one model call
+        done = threading.Event()
+        result = []
+
+        def _on_encoded(embedding):
+            if embedding is not None:
+                result.append(embedding)
+            done.set()
+
+        self.service.encode_batch_async(texts[0], _on_encoded)
+        if not done.wait(ENCODE_TIMEOUT) or not result:
+            return None
+        return result
 
     def search(self, query_embedding, limit=20, filters=None):
         """Search for similar embeddings using the storage."""
@@ -71,9 +111,22 @@ search = SearchService(storage.sqlite, embedding_service=embedding_manager if em
 app = FastAPI(
     title="Claude Logging API",
     description="Search and explore Claude Code conversation history",
-    version="1.0.0"
+    version="1.0.0",
+    default_response_class=ORJSONResponse
 )
 
+class JSONGZipMiddleware(GZipMiddleware):
+    """GZip API responses, leaving the SSE stream and (already compressed) images untouched."""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(("/api/events/stream", "/api/images/")):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+app.add_middleware(JSONGZipMiddleware, minimum_size=1024, compresslevel=5)
+
 # CORS for web interface
 app.add_middleware(
     CORSMiddleware,
@@ -129,6 +182,39 @@ class StatsResponse(BaseModel):
     last_session: Optional[str]
 
 
+# Short-lived response cache for hot read endpoints, cleared whenever a sync adds events.
+# key -> (created_at, body, etag)
+_response_cache: dict[tuple, tuple[float, bytes, str]] = {}
+
+
+def _invalidate_response_cache(events_synced: int) -> None:
+    """Drop cached responses once a sync has written new events."""
+    if events_synced:
+        _response_cache.clear()
+
+
+async def _cached_json_response(request: Request, key: tuple, compute) -> Response:
+    """
+    Serve compute()'s JSON result from the response cache with an ETag.
+
+    Returns 304 when the client's If-None-Match matches.
+    """
+    now = time.monotonic()
+    entry = _response_cache.get(key)
+    if entry is None or now - entry[0] > RESPONSE_CACHE_TTL:
+        body = orjson.dumps(await compute())
+        entry = (now, body, f'"{hashlib.blake2b(body, digest_size=8).hexdigest()}"')
+        if len(_response_cache) >= RESPONSE_CACHE_SIZE:
+            _response_cache.pop(next(iter(_response_cache)))
+        _response_cache[key] = entry
+
+    _, body, etag = entry
+    headers = {"ETag": etag, "Cache-Control": f"max-age={RESPONSE_CACHE_TTL}"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    return Response(body, media_type="application/json", headers=headers)
+
+
 # Routes
 @app.get("/")
 async def root():
@@ -144,11 +230,9 @@ async def search_logs(request: SearchRequest):
     Uses hybrid search (FTS5 + optional semantic) with RRF fusion.
     """
     try:
-        # Sync any new events first
-        storage.sync_all()
-
         # Perform search
-        results, time_ms = search.hybrid_search(
+        results, time_ms = await asyncio.to_thread(
+            search.hybrid_search,
             query=request.query,
             limit=request.limit,
             event_types=request.event_types,
@@ -183,24 +267,22 @@ async def search_logs(request: SearchRequest):
 
 @app.get("/api/sessions", response_model=List[SessionSummary])
 async def list_sessions(
+    request: Request,
     limit: int = Query(50, ge=1, le=200),
     offset: int = Query(0, ge=0),
     date_from: Optional[str] = None,
     date_to: Optional[str] = None
 ):
     """List sessions with pagination."""
-    try:
-        sessions = storage.sqlite.list_sessions(
+    async def compute():
+        sessions = await asyncio.to_thread(
+            storage.sqlite.list_sessions_with_type_counts,
             limit=limit,
             offset=offset,
             date_from=date_from,
             date_to=date_to
         )
 
-        # Get event type counts for all sessions in batch
-        session_ids = [s["id"] for s in sessions]
-        type_counts = storage.sqlite.get_event_type_counts_batch(session_ids)
-
         return [
             SessionSummary(
                 id=s["id"],
@@ -209,10 +291,15 @@ async def list_sessions(
                 cwd=s.get("cwd"),
                 summary=s.get("summary"),
                 event_count=s.get("event_count", 0),
-                event_type_counts=type_counts.get(s["id"], {})
-            )
+                event_type_counts=s["event_type_counts"]
+            ).model_dump()
             for s in sessions
         ]
+
+    try:
+        return await _cached_json_response(
+            request, ("sessions", limit, offset, date_from, date_to), compute
+        )
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
@@ -221,12 +308,12 @@ async def list_sessions(
 async def get_session(session_id: str):
     """Get a specific session with all events."""
     try:
-        session = storage.sqlite.get_session(session_id)
+        session = await asyncio.to_thread(storage.sqlite.get_session, session_id)
         if not session:
             raise HTTPException(status_code=404, detail="Session not found")
 
         # Get events from JSONL
-        events = list(storage.jsonl.read_session(session_id))
+        events = await asyncio.to_thread(list, storage.jsonl.read_session(session_id))
 
         return {
             "session": session,
@@ -239,10 +326,10 @@ async def get_session(session_id: str):
 
 
 @app.get("/api/stats", response_model=StatsResponse)
-async def get_stats():
+async def get_stats(request: Request):
     """Get overall statistics."""
-    try:
-        stats = storage.sqlite.get_stats()
+    async def compute():
+        stats = await asyncio.to_thread(storage.sqlite.get_stats)
 
         return StatsResponse(
             session_count=stats.get("session_count", 0) or 0,
@@ -250,11 +337,131 @@ async def get_stats():
             total_tokens=stats.get("total_tokens", 0) or 0,
             first_session=stats.get("first_session"),
             last_session=stats.get("last_session")
-        )
+        ).model_dump()
+
+    try:
+        return await _cached_json_response(request, ("stats",), compute)
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# session_id -> subagents directory, filled as transcripts are looked up
+_subagent_dirs: dict[str, Path] = {}
+
+
+def _find_subagent_file(session_id: str, agent_id: str) -> Optional[Path]:
+    """
+    Find a subagent transcript file.
+
+    Path pattern: ~/.claude/projects/.../session_id/subagents/agent-{agent_id}.jsonl
+    Project directories are only scanned the first time a session is seen.
+    """
+    filename = f"agent-{agent_id}.jsonl"
+
+    subagents_dir = _subagent_dirs.get(session_id)
+    if subagents_dir is not None:
+        candidate = subagents_dir / filename
+        if candidate.exists():
+            return candidate
+
+    claude_dir = Path.home() / ".claude" / "projects"
+    try:
+        projects = os.scandir(claude_dir)
+    except OSError:
+        return None
+
+    with projects:
+        for entry in projects:
+            candidate = Path(entry.path) / session_id / "subagents" / filename
+            if candidate.exists():
+                _subagent_dirs[session_id] = candidate.parent
+                return candidate
+    return None
+
+
+def _scan_transcript_lines(lines, prompt: str, final_response: str, message_count: int) -> tuple[str, str, int]:
+    """Fold transcript JSONL lines into (prompt, final response, message count)."""
+    for line in lines:
+        if line.strip():
+            try:
+                entry = orjson.loads(line)
+                msg_type = entry.get("type")
+
+                if msg_type == "user":
+                    # First user message is the prompt
+                    content = entry.get("message", {}).get("content", "")
+                    if isinstance(content, str):
+                        text = content
+                    elif isinstance(content, list) and len(content) > 0:
+                        # Content is a list of content blocks
+                        text = content[0].get("text", "") if isinstance(content[0], dict) else str(content[0])
+                    else:
+                        continue
+                    message_count += 1
+                    if not prompt:
+                        prompt = text
+
+                elif msg_type == "assistant":
+                    # Keep updating to get the last assistant text
+                    msg_content = entry.get("message", {}).get("content", [])
+                    if isinstance(msg_content, str):
+                        message_count += 1
+                        final_response = msg_content
+                    elif isinstance(msg_content, list):
+                        for block in msg_content:
+                            if isinstance(block, dict) and block.get("type") == "text":
+                                message_count += 1
+                                final_response = block.get("text", "")
+
+            except orjson.JSONDecodeError:
+                continue
+
+    return prompt, final_response, message_count
+
+
+def _mmap_lines(m: mmap.mmap, start: int, end: int):
+    """Yield the lines of a memory-mapped file between two byte offsets."""
+    m.seek(start)
+    while m.tell() < end:
+        yield m.readline()
+
+
+# path -> (bytes scanned, (prompt, final response, message count)), so each
+# transcript line is parsed once no matter how often it is viewed
+_subagent_transcripts: dict[Path, tuple[int, tuple[str, str, int]]] = {}
+
+
+def _read_subagent_transcript(subagent_file: Path) -> tuple[str, str, int]:
+    """
+    Read a subagent transcript.
+
+    Returns the prompt (first user message), the final response (last
+    assistant text block), and the number of messages seen.
+    """
+    offset, state = _subagent_transcripts.get(subagent_file, (0, ("", "", 0)))
+
+    with open(subagent_file, "rb") as f:
+        size = os.fstat(f.fileno()).st_size
+        if offset > size:
+            offset, state = 0, ("", "", 0)  # File was rewritten
+        if size == offset:
+            return state
+
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+            # Only newline-terminated lines are final; a trailing partial line is rescanned next time
+            end = m.rfind(b"\n", offset) + 1
+            if end > offset:
+                state = _scan_transcript_lines(_mmap_lines(m, offset, end), *state)
+                offset = end
+            tail = m[offset:size]
+
+    if len(_subagent_transcripts) >= SUBAGENT_TRANSCRIPT_CACHE_SIZE:
+        _subagent_transcripts.pop(next(iter(_subagent_transcripts)))
+    _subagent_transcripts[subagent_file] = (offset, state)
+
+    return _scan_transcript_lines([tail], *state) if tail else state
+
+
 @app.get("/api/subagent-transcript/{session_id}/{agent_id}")
 async def get_subagent_transcript(session_id: str, agent_id: str):
     """
@@ -263,69 +470,20 @@ async def get_subagent_transcript(session_id: str, agent_id: str):
     Returns the prompt (first message) and response (last assistant message).
     """
     try:
-        # Find the subagent transcript file
-        # Path pattern: ~/.claude/projects/.../session_id/subagents/agent-{agent_id}.jsonl
-        claude_dir = Path.home() / ".claude" / "projects"
-
-        # Search for the subagent file
-        subagent_file = None
-        for project_dir in claude_dir.glob("*"):
-            candidate = project_dir / session_id / "subagents" / f"agent-{agent_id}.jsonl"
-            if candidate.exists():
-                subagent_file = candidate
-                break
-
+        subagent_file = await asyncio.to_thread(_find_subagent_file, session_id, agent_id)
         if not subagent_file:
             raise HTTPException(status_code=404, detail="Subagent transcript not found")
 
-        # Read the transcript
-        messages = []
-        with open(subagent_file, "r") as f:
-            for line in f:
-                if line.strip():
-                    try:
-                        entry = json.loads(line)
-                        msg_type = entry.get("type")
-
-                        if msg_type == "user":
-                            # First user message is the prompt
-                            content = entry.get("message", {}).get("content", "")
-                            if isinstance(content, str):
-                                messages.append({"type": "prompt", "content": content})
-                            elif isinstance(content, list) and len(content) > 0:
-                                # Content is a list of content blocks
-                                text = content[0].get("text", "") if isinstance(content[0], dict) else str(content[0])
-                                messages.append({"type": "prompt", "content": text})
-
-                        elif msg_type == "assistant":
-                            # Get assistant text content
-                            msg_content = entry.get("message", {}).get("content", [])
-                            if isinstance(msg_content, str):
-                                messages.append({"type": "response", "content": msg_content})
-                            elif isinstance(msg_content, list):
-                                for block in msg_content:
-                                    if isinstance(block, dict) and block.get("type") == "text":
-                                        messages.append({"type": "response", "content": block.get("text", "")})
-
-                    except json.JSONDecodeError:
-                        continue
-
-        # Get the prompt (first message) and final response (last text response)
-        prompt = ""
-        final_response = ""
-
-        for msg in messages:
-            if msg["type"] == "prompt" and not prompt:
-                prompt = msg["content"]
-            elif msg["type"] == "response":
-                final_response = msg["content"]  # Keep updating to get the last one
+        prompt, final_response, message_count = await asyncio.to_thread(
+            _read_subagent_transcript, subagent_file
+        )
 
         return {
             "agent_id": agent_id,
             "session_id": session_id,
             "prompt": prompt,
             "response": final_response,
-            "message_count": len(messages)
+            "message_count": message_count
         }
 
     except HTTPException:
@@ -341,9 +499,6 @@ async def get_recent_events(
 ):
     """Get recent events (for browsing without search)."""
     try:
-        # Sync first to ensure we have latest
-        storage.sync_all()
-
         # Build query
         sql = """
             SELECT id, session_id, type, ts, content
@@ -361,18 +516,23 @@ async def get_recent_events(
         sql += " ORDER BY ts DESC LIMIT ?"
         params.append(limit)
 
-        cursor = storage.sqlite.conn.execute(sql, params)
-        results = []
-        for row in cursor:
-            results.append({
-                "event_id": row[0],
-                "session_id": row[1],
-                "event_type": row[2],
-                "timestamp": row[3],
-                "content": row[4] or "",
-                "score": 0,
-                "source": "recent"
-            })
+        def _query():
+            cursor = storage.sqlite.conn.execute(sql, params)
+            cursor.arraysize = limit
+            return [
+                {
+                    "event_id": row["id"],
+                    "session_id": row["session_id"],
+                    "event_type": row["type"],
+                    "timestamp": row["ts"],
+                    "content": row["content"] or "",
+                    "score": 0,
+                    "source": "recent"
+                }
+                for row in cursor.fetchall()
+            ]
+
+        results = await asyncio.to_thread(_query)
 
         return {"results": results, "total": len(results), "time_ms": 0}
     except Exception as e:
@@ -381,14 +541,62 @@ async def get_recent_events(
 
 @app.get("/api/sync")
 async def sync_all():
-    """Sync all JSONL files to SQLite."""
+    """Sync all JSONL files to SQLite now (normally done in the background)."""
     try:
-        events_synced = storage.sync_all()
+        events_synced = await asyncio.to_thread(storage.sync_all)
+        _invalidate_response_cache(events_synced)
         return {"synced": events_synced}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+# (session_id, filename) -> verified image path. Images never change once written.
+_image_paths: dict[tuple[str, str], Path] = {}
+
+
+def _find_image(session_id: str, filename: str) -> Optional[Path]:
+    """
+    Find an image in the known storage locations.
+
+    1. New plugin path: .claude/local/logging/images/{session_id}/
+    2. Old plugin path: .claude/logging/YYYY/MM/images/{session_id}/
+    """
+    candidate = STORAGE_PATH / "images" / session_id / filename
+    if candidate.exists():
+        return candidate
+
+    # Search for images directory in any date folder of the old layout
+    try:
+        years = [e.path for e in os.scandir(PROJECT_DIR / ".claude" / "logging")
+                 if e.name.startswith("20") and e.is_dir()]
+    except OSError:
+        return None
+
+    for year in years:
+        try:
+            months = [e.path for e in os.scandir(year) if e.is_dir()]
+        except OSError:
+            continue
+        for month in months:
+            candidate = Path(month) / "images" / session_id / filename
+            if candidate.exists():
+                return candidate
+    return None
+
+
+_is_valid_session_id = re.compile(r'[a-zA-Z0-9\-]+').fullmatch
+# Images may only be served from inside these directories
+_IMAGE_ROOTS = (STORAGE_PATH.resolve(), (PROJECT_DIR / ".claude").resolve())
+# Allowed image extensions and the content type served for each
+_IMAGE_CONTENT_TYPES = {
+    'jpg': 'image/jpeg',
+    'jpeg': 'image/jpeg',
+    'png': 'image/png',
+    'gif': 'image/gif',
+    'webp': 'image/webp',
+}
+
+
 @app.get("/api/images/{session_id}/{filename}")
 async def serve_image(session_id: str, filename: str):
     """
@@ -400,74 +608,49 @@ async def serve_image(session_id: str, filename: str):
     Checks multiple storage locations to support different plugin versions.
     """
     try:
-        # Security: validate session_id and filename format
-        # Only allow alphanumeric, hyphens, underscores, and dots
-        if not re.match(r'^[a-zA-Z0-9\-]+$', session_id):
+        # Security: keep lookups inside images/{session_id}/. The filename cannot contain
+        # a slash (it is a single path segment), and the resolved path is checked below.
+        if not _is_valid_session_id(session_id):
             raise HTTPException(status_code=400, detail="Invalid session ID format")
-        if not re.match(r'^[a-zA-Z0-9_\-\.]+$', filename):
-            raise HTTPException(status_code=400, detail="Invalid filename format")
-
-        # Prevent path traversal
-        if ".." in filename or "/" in filename or "\\" in filename:
-            raise HTTPException(status_code=400, detail="Invalid filename")
 
         # Validate file extension is an allowed image type
-        allowed_extensions = {'.jpg', '.jpeg', '.png', '.gif', '.webp'}
-        file_ext = filename.lower().rsplit('.', 1)[-1] if '.' in filename else ''
-        if f'.{file_ext}' not in allowed_extensions:
+        _, dot, ext = filename.rpartition(".")
+        content_type = _IMAGE_CONTENT_TYPES.get(ext.lower()) if dot else None
+        if content_type is None:
             raise HTTPException(status_code=400, detail="Invalid file type")
 
-        # Check multiple possible image locations
-        # 1. New plugin path: .claude/local/logging/images/{session_id}/
-        # 2. Old plugin path: .claude/logging/YYYY/MM/images/{session_id}/
-        project_dir = Path(os.environ.get("CLAUDE_PROJECT_DIR", os.getcwd()))
-        possible_paths = [
-            STORAGE_PATH / "images" / session_id / filename,
-        ]
+        key = (session_id, filename)
+        image_path = _image_paths.get(key)
+        if image_path is None or not image_path.exists():
+            image_path = await asyncio.to_thread(_find_image, session_id, filename)
 
-        # Also check the old plugin's date-based structure
-        old_logging_dir = project_dir / ".claude" / "logging"
-        if old_logging_dir.exists():
-            # Search for images directory in any date folder
-            for year_dir in old_logging_dir.glob("20*"):
-                for month_dir in year_dir.glob("*"):
-                    candidate = month_dir / "images" / session_id / filename
-                    if candidate.exists():
-                        possible_paths.insert(0, candidate)  # Prefer found paths
-
-        # Find first existing path
-        image_path = None
-        for path in possible_paths:
-            if path.exists():
-                image_path = path
-                break
-
-        if not image_path:
-            raise HTTPException(status_code=404, detail="Image not found")
-
-        # Security: verify path is within an allowed directory
-        allowed_roots = [STORAGE_PATH.resolve(), (project_dir / ".claude").resolve()]
-        path_ok = False
-        for root in allowed_roots:
-            try:
-                image_path.resolve().relative_to(root)
-                path_ok = True
-                break
-            except ValueError:
-                continue
+            if not image_path:
+                raise HTTPException(status_code=404, detail="Image not found")
+
+            # Security: the resolved path (symlinks and '..' collapsed) must stay within an allowed root
+            image_path = image_path.resolve()
+            if not any(image_path.is_relative_to(root) for root in _IMAGE_ROOTS):
+                raise HTTPException(status_code=403, detail="Access denied")
 
-        if not path_ok:
-            raise HTTPException(status_code=403, detail="Access denied")
+            if len(_image_paths) >= IMAGE_PATH_CACHE_SIZE:
+                _image_paths.pop(next(iter(_image_paths)))
+            _image_paths[key] = image_path
 
-        # Determine content type
-        content_type, _ = mimetypes.guess_type(str(image_path))
-        if not content_type:
-            content_type = "application/octet-stream"
+        # Image filenames embed a content hash, so they never change
+        headers = {"Cache-Control": "public, max-age=31536000, immutable"}
+
+        if IMAGES_ACCEL_REDIRECT:
+            # Old-layout images outside STORAGE_PATH are still served below
+            if image_path.is_relative_to(_IMAGE_ROOTS[0]):
+                relative = image_path.relative_to(_IMAGE_ROOTS[0])
+                headers["X-Accel-Redirect"] = f"{IMAGES_ACCEL_REDIRECT.rstrip('/')}/{relative.as_posix()}"
+                return Response(media_type=content_type, headers=headers)
 
         return FileResponse(
             image_path,
             media_type=content_type,
-            filename=filename
+            filename=filename,
+            headers=headers
         )
 
     except HTTPException:
@@ -476,6 +659,26 @@ async def serve_image(session_id: str, filename: str):
         raise HTTPException(status_code=500, detail=str(e))
 
 
+_IMAGES_PATCH_RE = re.compile(rb'"type":\s*"ImagesPatch"')
+
+
+def _read_new_lines(path: Path, position: int) -> tuple[list[bytes], int]:
+    """Read complete lines appended to a file since position. Returns (lines, new position)."""
+    lines = []
+    with open(path, "rb", buffering=1 << 16) as f:
+        if position > os.fstat(f.fileno()).st_size:
+            position = 0  # File was rewritten
+        f.seek(position)
+        for line in f:
+            if not line.endswith(b"\n"):
+                break  # Partial write, pick it up next time
+            position += len(line)
+            # ImagesPatch records only amend earlier events; they aren't events to show
+            if line.strip() and not _IMAGES_PATCH_RE.search(line):
+                lines.append(line.rstrip(b"\n"))
+    return lines, position
+
+
 @app.get("/api/events/stream")
 async def stream_events():
     """
@@ -484,42 +687,34 @@ async def stream_events():
     Watches the sessions directory for changes and emits events.
     """
     async def event_generator():
+        sessions_dir = STORAGE_PATH / "sessions"
+
         try:
             import watchfiles
 
-            sessions_dir = STORAGE_PATH / "sessions"
+            # Only stream events written after the client connected
+            seen_positions = {str(p): p.stat().st_size for p in sessions_dir.glob("*.jsonl")}
 
             async for changes in watchfiles.awatch(sessions_dir):
                 for change_type, path in changes:
                     if path.endswith(".jsonl"):
-                        # Read last line of changed file
                         try:
-                            with open(path, "r") as f:
-                                lines = f.readlines()
-                                if lines:
-                                    event = json.loads(lines[-1])
-                                    yield f"data: {json.dumps(event)}\n\n"
+                            lines, seen_positions[path] = _read_new_lines(Path(path), seen_positions.get(path, 0))
                         except Exception:
-                            pass
+                            continue
+                        for line in lines:
+                            yield b"data: " + line + b"\n\n"
         except ImportError:
             # watchfiles not installed, poll instead
             seen_positions = {}
 
             while True:
-                sessions_dir = STORAGE_PATH / "sessions"
-
                 for session_file in sessions_dir.glob("*.jsonl"):
-                    current_size = session_file.stat().st_size
-                    last_size = seen_positions.get(str(session_file), 0)
-
-                    if current_size > last_size:
-                        with open(session_file, "r") as f:
-                            f.seek(last_size)
-                            for line in f:
-                                if line.strip():
-                                    yield f"data: {line}\n\n"
-
-                        seen_positions[str(session_file)] = current_size
+                    path = str(session_file)
+                    if session_file.stat().st_size != seen_positions.get(path, 0):
+                        lines, seen_positions[path] = _read_new_lines(session_file, seen_positions.get(path, 0))
+                        for line in lines:
+                            yield b"data: " + line + b"\n\n"
 
                 await asyncio.sleep(1)
 
@@ -529,16 +724,54 @@ async def stream_events():
     )
 
 
+async def _sync_watcher():
+    """Keep SQLite in sync with session JSONL files as they change."""
+    sessions_dir = STORAGE_PATH / "sessions"
+    try:
+        import watchfiles
+
+        async for changes in watchfiles.awatch(sessions_dir):
+            for change_type, path in changes:
+                if path.endswith(".jsonl"):
+                    try:
+                        events_synced = await asyncio.to_thread(storage.sync_session, Path(path).stem)
+                        _invalidate_response_cache(events_synced)
+                    except Exception as e:
+                        print(f"Sync failed for {path}: {e}")
+    except ImportError:
+        # watchfiles not installed, poll instead
+        while True:
+            await asyncio.sleep(1)
+            try:
+                events_synced = await asyncio.to_thread(storage.sync_all)
+                _invalidate_response_cache(events_synced)
+            except Exception as e:
+                print(f"Sync failed: {e}")
+
+
+_sync_task: Optional[asyncio.Task] = None
+
+
 @app.on_event("startup")
 async def startup():
-    """Sync all sessions on startup."""
-    storage.sync_all()
+    """Sync all sessions on startup, then keep syncing in the background."""
+    global _sync_task
+    # Bound the worker threads used for blocking storage calls
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=min(32, (os.cpu_count() or 1) * 4))
+    )
+    await asyncio.to_thread(storage.sync_all)
+    _sync_task = asyncio.create_task(_sync_watcher())
 
 
 @app.on_event("shutdown")
 async def shutdown():
     """Clean up on shutdown."""
+    if _sync_task:
+        _sync_task.cancel()
     storage.close()
+    # Persists FAISS vectors added since the last background save
+    embedding_manager.storage.close()
 
 
 def main():
@@ -547,12 +780,15 @@ def main():
 
     port = int(os.environ.get("LOGGING_API_PORT", 3001))
 
+    # uvicorn[standard] provides uvloop and httptools; fall back to asyncio/h11 without them
     uvicorn.run(
         "api.server:app",
         host="127.0.0.1",
         port=port,
         reload=True,
-        log_level="info"
+        log_level="info",
+        loop="auto",
+        http="auto"
     )
 
 
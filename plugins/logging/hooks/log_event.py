@@ -11,17 +11,56 @@ Usage:
 
 import json
 import sys
-import argparse
 import os
 import fcntl
 import hashlib
-import mimetypes
+import functools
 from pathlib import Path
 from datetime import datetime, timezone
-from collections import Counter
 import uuid
-from base64 import b64decode
-from typing import Optional, List, Dict, Any, Tuple
+from typing import Optional, List, Dict, Any, Tuple, Union, BinaryIO
+
+try:
+    from pybase64 import b64decode  # SIMD-accelerated, same API as base64.b64decode
+except ImportError:
+    from base64 import b64decode
+
+try:
+    import orjson
+    _loads = orjson.loads
+
+    def _dumps(obj: Any) -> bytes:
+        """Serialize an event to one JSONL line (orjson fast path)."""
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            # Values orjson rejects (e.g. integers wider than 64 bits)
+            return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+except ImportError:
+    _loads = json.loads
+
+    def _dumps(obj: Any) -> bytes:
+        """Serialize an event to one JSONL line (stdlib fallback)."""
+        return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
+
+# Transcripts can be many MB: read them line by line through a large buffer
+READ_BUFFER = 1 << 20
+
+# Base64 characters decoded per write when saving images (multiple of 4)
+B64_CHUNK = 1 << 18
+
+# Bytes before the markdown render offset that must be unchanged to resume rendering
+MD_STATE_TAIL = 256
+
+# Image media types we save, with the file extension for each
+_EXT_BY_MEDIA_TYPE = {
+    "image/jpeg": ".jpg",
+    "image/jpg": ".jpg",
+    "image/png": ".png",
+    "image/gif": ".gif",
+    "image/webp": ".webp",
+}
+_ALLOWED_IMAGE_TYPES = frozenset(_EXT_BY_MEDIA_TYPE)
 
 # Emojis for visual distinction in markdown
 EMOJIS = {
@@ -54,18 +93,82 @@ def get_storage_path(cwd: Optional[str] = None) -> Path:
     return Path(project_dir) / ".claude" / "local" / "logging"
 
 
+# Directories already created by this process
+_ensured_dirs: set = set()
+
+
+def _ensure_dir(path: Path) -> Path:
+    """Create a directory once per process, skipping the mkdir on repeat calls."""
+    if path not in _ensured_dirs:
+        path.mkdir(parents=True, exist_ok=True)
+        _ensured_dirs.add(path)
+    return path
+
+
 def get_session_path(storage_path: Path, session_id: str) -> Path:
     """Get the JSONL file path for a session."""
-    sessions_dir = storage_path / "sessions"
-    sessions_dir.mkdir(parents=True, exist_ok=True)
-    return sessions_dir / f"{session_id}.jsonl"
+    return _ensure_dir(storage_path / "sessions") / f"{session_id}.jsonl"
 
 
 def get_images_dir(storage_path: Path, session_id: str) -> Path:
     """Get the images directory for a session."""
-    images_dir = storage_path / "images" / session_id
-    images_dir.mkdir(parents=True, exist_ok=True)
-    return images_dir
+    return _ensure_dir(storage_path / "images" / session_id)
+
+
+# images_dir -> filenames already on disk, listed once per process
+_image_names: Dict[Path, set] = {}
+
+
+def _b64_decoded_size(data) -> int:
+    """Size in bytes of base64 data once decoded, without decoding it."""
+    tail = data[-2:]
+    if isinstance(tail, bytes):
+        tail = tail.decode("ascii")
+    return len(data) * 3 // 4 - (len(tail) - len(tail.rstrip("=")))
+
+
+def _write_all(fd: int, data: bytes) -> int:
+    """Write all of data to a file descriptor. Returns the number of bytes written."""
+    view = memoryview(data)
+    while view:
+        view = view[os.write(fd, view):]
+    return len(data)
+
+
+def _save_image(images_dir: Path, filename: str, data) -> int:
+    """Decode and write a base64 image unless the file already exists. Returns its size."""
+    names = _image_names.get(images_dir)
+    if names is None:
+        names = _image_names[images_dir] = set(os.listdir(images_dir))
+
+    if filename in names:
+        return _b64_decoded_size(data)
+
+    filepath = images_dir / filename
+    tmp_path = images_dir / f".{filename}.{os.getpid()}.tmp"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_CLOEXEC, 0o644)
+    try:
+        try:
+            if len(data) % 4:
+                size = _write_all(fd, b64decode(data))  # Not plain padded base64, decode it whole
+            else:
+                # Decode in 4-aligned chunks so the whole image is never held in memory
+                size = 0
+                for start in range(0, len(data), B64_CHUNK):
+                    size += _write_all(fd, b64decode(data[start:start + B64_CHUNK]))
+            if hasattr(os, "posix_fadvise"):
+                # Written once and rarely read back soon: keep it out of the page cache
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+        finally:
+            os.close(fd)
+        # Rename into place so readers (and the dedup check) never see a partial image
+        os.replace(tmp_path, filepath)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+
+    names.add(filename)
+    return size
 
 
 def extract_images_from_prompt(
@@ -119,43 +222,35 @@ def extract_images_from_prompt(
             # Currently Claude Code uses base64 encoding
             if source.get("type") == "base64":
                 # Validate and normalize media type
-                ALLOWED_IMAGE_TYPES = {
-                    "image/jpeg", "image/jpg", "image/png",
-                    "image/gif", "image/webp"
-                }
                 media_type = source.get("media_type", "image/jpeg")
-                if media_type not in ALLOWED_IMAGE_TYPES:
+                if media_type not in _ALLOWED_IMAGE_TYPES:
                     media_type = "image/jpeg"  # Default to jpeg for unknown types
 
                 data = source.get("data", "")
 
                 if data:
                     try:
-                        # Decode base64 image data
-                        image_bytes = b64decode(data)
-
-                        # Generate content hash for deduplication/identification
-                        content_hash = hashlib.sha256(image_bytes).hexdigest()[:12]
+                        # Hash the base64 text (1:1 with the image bytes) so a
+                        # duplicate is recognized without decoding it
+                        content_hash = hashlib.sha256(
+                            data.encode("ascii") if isinstance(data, str) else data
+                        ).hexdigest()[:12]
 
                         # Determine file extension from media type
-                        ext = mimetypes.guess_extension(media_type) or ".jpg"
-                        if ext == ".jpe":  # mimetypes returns .jpe for jpeg
-                            ext = ".jpg"
+                        ext = _EXT_BY_MEDIA_TYPE[media_type]
 
                         # Create filename: hash_eventId_index.ext
                         filename = f"{content_hash}_{event_id}_{idx}{ext}"
-                        filepath = images_dir / filename
 
-                        # Save image (skip if already exists - deduplication)
-                        if not filepath.exists():
-                            filepath.write_bytes(image_bytes)
+                        # Save image (skip decoding if already exists - deduplication)
+                        size = _save_image(images_dir, filename, data)
 
                         # Add reference to list
                         image_refs.append({
                             "type": "image",
                             "path": f"images/{session_id}/{filename}",
                             "media_type": media_type,
-                            "size": len(image_bytes),
+                            "size": size,
                             "index": idx
                         })
 
@@ -178,26 +273,67 @@ def extract_images_from_prompt(
     return combined_text, image_refs
 
 
+def _read_count(count_path: Path) -> Optional[int]:
+    """Read a session's context reset counter, or None if it doesn't exist yet."""
+    try:
+        return int(count_path.read_text())
+    except (OSError, ValueError):
+        return None
+
+
+def _write_count(f, count: int) -> None:
+    """Overwrite an open counter file with a new count."""
+    f.seek(0)
+    f.truncate()
+    f.write(str(count))
+
+
+def _count_context_resets(session_path: Path) -> int:
+    """Count compact/clear events by scanning the session JSONL."""
+    if not session_path.exists():
+        return 0
+    content = session_path.read_text()
+    # Events are written compact by orjson, or with spaces by the json module
+    return sum(
+        content.count(f'"source":{sep}"{source}"')
+        for sep in ("", " ")
+        for source in ("compact", "clear")
+    )
+
+
 def get_agent_session_num(session_path: Path, source: Optional[str]) -> int:
     """
-    Calculate agent_session_num from JSONL content.
+    Get agent_session_num from the session's counter file.
 
-    This uses the "stateless state tracking" pattern - we derive the
-    count from the data itself rather than maintaining a separate counter.
-    Context resets (compact/clear) increment the session number.
+    Context resets (compact/clear) increment the session number. The count
+    lives in a small {session_id}.count file next to the JSONL so regular
+    events don't have to rescan the whole session; sessions that predate the
+    counter rebuild it once from the JSONL content.
     """
-    if not session_path.exists():
-        return 1 if source in ("compact", "clear") else 0
+    count_path = session_path.with_suffix(".count")
+    is_reset = source in ("compact", "clear")
+
+    if not is_reset:
+        count = _read_count(count_path)
+        if count is not None:
+            return count
 
     try:
-        content = session_path.read_text()
-        count = (
-            content.count('"source": "compact"') +
-            content.count('"source": "clear"')
-        )
+        with open(count_path, "a+") as f:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+            try:
+                f.seek(0)
+                try:
+                    count = int(f.read())
+                except ValueError:
+                    count = _count_context_resets(session_path)
+
+                if is_reset:
+                    count += 1
 
-        if source in ("compact", "clear"):
-            count += 1
+                _write_count(f, count)
+            finally:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
 
         return count
     except Exception:
@@ -206,18 +342,21 @@ def get_agent_session_num(session_path: Path, source: Optional[str]) -> int:
 
 def append_events(session_path: Path, events: list) -> None:
     """
-    Append multiple events to session JSONL file atomically with file locking.
+    Append multiple events to session JSONL file atomically.
 
     Writing multiple events in a single file operation ensures they're captured
-    together without race conditions (learned from old logging system).
+    together without race conditions (learned from old logging system). The
+    lines are joined up front and written with one write() on an O_APPEND
+    descriptor, which the kernel appends atomically, so no flock is needed.
     """
-    with open(session_path, "a") as f:
-        fcntl.flock(f.fileno(), fcntl.LOCK_EX)
-        try:
-            for event in events:
-                f.write(json.dumps(event, ensure_ascii=False) + "\n")
-        finally:
-            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    payload = b"".join(_dumps(event) for event in events)
+    fd = os.open(
+        session_path, os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_CLOEXEC, 0o644
+    )
+    try:
+        os.write(fd, payload)
+    finally:
+        os.close(fd)
 
 
 def append_event(session_path: Path, event: dict) -> None:
@@ -225,6 +364,52 @@ def append_event(session_path: Path, event: dict) -> None:
     append_events(session_path, [event])
 
 
+def _format_bash_input(tool_input: dict) -> str:
+    """Describe a Bash command about to run."""
+    cmd = tool_input.get("command", "")
+    desc = tool_input.get("description", "")
+    return f"Running: {cmd}" + (f" ({desc})" if desc else "")
+
+
+def _format_bash_output(response: Any) -> str:
+    """Summarize Bash output."""
+    stdout = response.get("stdout", "") if isinstance(response, dict) else str(response)
+    if stdout:
+        # Truncate long output
+        lines = stdout.strip().split('\n')
+        if len(lines) > 3:
+            return f"Output ({len(lines)} lines): {lines[0][:100]}..."
+        return f"Output: {stdout[:200]}"
+    return "Command completed (no output)"
+
+
+def _format_glob_output(response: Any) -> str:
+    """Summarize a Glob result."""
+    if isinstance(response, dict):
+        count = response.get("numFiles", 0)
+        return f"Found {count} files"
+    return "Glob completed"
+
+
+# Content formatters by tool name; tools not listed use a generic fallback
+_PRE_FORMATTERS = {
+    "Bash": _format_bash_input,
+    "Read": lambda ti: f"Reading file: {ti.get('file_path', '')}",
+    "Write": lambda ti: f"Writing file: {ti.get('file_path', '')}",
+    "Edit": lambda ti: f"Editing file: {ti.get('file_path', '')}",
+    "Glob": lambda ti: f"Finding files: {ti.get('pattern', '')}",
+    "Grep": lambda ti: f"Searching for: {ti.get('pattern', '')}",
+    "Task": lambda ti: f"Spawning agent: {ti.get('description', ti.get('prompt', '')[:100])}",
+}
+
+_POST_FORMATTERS = {
+    "Bash": _format_bash_output,
+    "Read": lambda response: "File read successfully",
+    "Glob": _format_glob_output,
+    "Grep": lambda response: "Search completed",
+}
+
+
 def extract_content(event_type: str, data: dict) -> Optional[str]:
     """Extract human-readable content from event data."""
     if event_type == "UserPromptSubmit":
@@ -251,51 +436,20 @@ def extract_content(event_type: str, data: dict) -> Optional[str]:
         tool_name = data.get("tool_name", "Unknown")
         tool_input = data.get("tool_input", {})
 
-        # Format based on tool type
-        if tool_name == "Bash":
-            cmd = tool_input.get("command", "")
-            desc = tool_input.get("description", "")
-            return f"Running: {cmd}" + (f" ({desc})" if desc else "")
-        elif tool_name == "Read":
-            return f"Reading file: {tool_input.get('file_path', '')}"
-        elif tool_name == "Write":
-            return f"Writing file: {tool_input.get('file_path', '')}"
-        elif tool_name == "Edit":
-            return f"Editing file: {tool_input.get('file_path', '')}"
-        elif tool_name == "Glob":
-            return f"Finding files: {tool_input.get('pattern', '')}"
-        elif tool_name == "Grep":
-            return f"Searching for: {tool_input.get('pattern', '')}"
-        elif tool_name == "Task":
-            return f"Spawning agent: {tool_input.get('description', tool_input.get('prompt', '')[:100])}"
-        else:
-            # Generic fallback
-            return f"{tool_name}: {str(tool_input)[:200]}"
+        formatter = _PRE_FORMATTERS.get(tool_name)
+        if formatter:
+            return formatter(tool_input)
+        # Generic fallback
+        return f"{tool_name}: {str(tool_input)[:200]}"
 
     elif event_type == "PostToolUse":
         tool_name = data.get("tool_name", "Unknown")
         response = data.get("tool_response", {})
 
-        if tool_name == "Bash":
-            stdout = response.get("stdout", "") if isinstance(response, dict) else str(response)
-            if stdout:
-                # Truncate long output
-                lines = stdout.strip().split('\n')
-                if len(lines) > 3:
-                    return f"Output ({len(lines)} lines): {lines[0][:100]}..."
-                return f"Output: {stdout[:200]}"
-            return "Command completed (no output)"
-        elif tool_name == "Read":
-            return "File read successfully"
-        elif tool_name == "Glob":
-            if isinstance(response, dict):
-                count = response.get("numFiles", 0)
-                return f"Found {count} files"
-            return "Glob completed"
-        elif tool_name == "Grep":
-            return "Search completed"
-        else:
-            return f"{tool_name} completed"
+        formatter = _POST_FORMATTERS.get(tool_name)
+        if formatter:
+            return formatter(response)
+        return f"{tool_name} completed"
 
     elif event_type == "SubagentStop":
         agent_type = data.get("agent_type", "")
@@ -323,7 +477,7 @@ def extract_content(event_type: str, data: dict) -> Optional[str]:
 
 def quote(text: str) -> str:
     """Convert text to markdown blockquote."""
-    return "\n".join(f"> {line}" for line in text.split("\n"))
+    return "> " + text.replace("\n", "\n> ")
 
 
 def tool_preview(data: dict) -> str:
@@ -338,23 +492,80 @@ def tool_preview(data: dict) -> str:
     return ""
 
 
-def get_response(transcript_path: str) -> str:
-    """Extract last assistant response from Claude's transcript."""
+@functools.lru_cache(maxsize=4)
+def _parse_transcript(path: str, mtime_ns: int, size: int) -> List[Dict[str, Any]]:
+    """Parse a transcript JSONL file (cached per file version), skipping bad lines."""
+    entries = []
+    with open(path, "rb", buffering=READ_BUFFER) as f:
+        for line in f:
+            if not line.strip():
+                continue
+            try:
+                entries.append(_loads(line))
+            except json.JSONDecodeError:
+                continue
+    return entries
+
+
+def _load_transcript(transcript_path: str) -> List[Dict[str, Any]]:
+    """Get the parsed entries of Claude's transcript, parsing it once per process."""
+    st = os.stat(transcript_path)
+    return _parse_transcript(str(transcript_path), st.st_mtime_ns, st.st_size)
+
+
+def _last_assistant_text(entries_newest_first) -> Optional[str]:
+    """Find the first text block of the last assistant entry that has one."""
+    for entry in entries_newest_first:
+        if entry.get("type") == "assistant":
+            for block in entry.get("message", {}).get("content", []):
+                if block.get("type") == "text":
+                    return block.get("text", "")
+    return None
+
+
+def _tail_lines(path: str, max_bytes: int) -> Tuple[List[bytes], bool]:
+    """
+    Read the complete lines in the last max_bytes of a file.
+
+    Returns (lines, reached_start); the first line of a window that starts
+    mid-file is dropped since it is likely cut off.
+    """
+    with open(path, "rb") as f:
+        size = f.seek(0, os.SEEK_END)
+        start = max(0, size - max_bytes)
+        f.seek(start)
+        lines = f.read().split(b"\n")
+    if start > 0:
+        lines = lines[1:]
+    return lines, start == 0
+
+
+def get_response(transcript: Union[str, List[Dict[str, Any]]], tail_bytes: int = 1 << 20) -> str:
+    """Extract last assistant response from Claude's transcript (path or parsed entries)."""
     try:
-        for line in reversed(Path(transcript_path).read_text().strip().split("\n")):
-            if line.strip():
-                entry = json.loads(line)
-                if entry.get("type") == "assistant":
-                    for block in entry.get("message", {}).get("content", []):
-                        if block.get("type") == "text":
-                            return block.get("text", "")
+        if isinstance(transcript, list):
+            text = _last_assistant_text(reversed(transcript))
+        else:
+            # The response is almost always near the end: read a window from the
+            # end of the file and only widen it if no assistant text is found
+            window = tail_bytes
+            while True:
+                lines, reached_start = _tail_lines(transcript, window)
+                text = _last_assistant_text(
+                    _loads(line) for line in reversed(lines) if line.strip()
+                )
+                if text is not None or reached_start:
+                    break
+                window *= 4
+        if text is not None:
+            return text
     except Exception:
         pass
     return ""
 
 
 def extract_images_from_transcript(
-    transcript_path: str,
+    transcript: Union[str, List[Dict[str, Any]]],
     storage_path: Path,
     session_id: str
 ) -> Dict[int, List[Dict[str, Any]]]:
@@ -366,7 +577,7 @@ def extract_images_from_transcript(
     the Stop hook when the transcript is complete.
 
     Args:
-        transcript_path: Path to Claude's transcript JSONL file
+        transcript: Path to Claude's transcript JSONL file, or its parsed entries
         storage_path: Base logging storage directory
         session_id: Current session ID
 
@@ -377,22 +588,15 @@ def extract_images_from_transcript(
     image_refs_by_msg: Dict[int, List[Dict[str, Any]]] = {}
 
     try:
-        transcript = Path(transcript_path)
-        if not transcript.exists():
-            return {}
+        if not isinstance(transcript, list):
+            if not Path(transcript).exists():
+                return {}
+            transcript = _load_transcript(transcript)
 
-        lines = transcript.read_text().strip().split("\n")
         user_msg_idx = 0
+        images_dir = get_images_dir(storage_path, session_id)
 
-        for line in lines:
-            if not line.strip():
-                continue
-
-            try:
-                entry = json.loads(line)
-            except json.JSONDecodeError:
-                continue
-
+        for entry in transcript:
             # Only process user messages
             if entry.get("type") != "user":
                 continue
@@ -406,7 +610,6 @@ def extract_images_from_transcript(
 
             # Look for image blocks in this user message
             images_in_msg = []
-            images_dir = get_images_dir(storage_path, session_id)
 
             for block_idx, block in enumerate(content):
                 if not isinstance(block, dict):
@@ -426,39 +629,30 @@ def extract_images_from_transcript(
                         continue
 
                     # Validate media type
-                    ALLOWED_IMAGE_TYPES = {
-                        "image/jpeg", "image/jpg", "image/png",
-                        "image/gif", "image/webp"
-                    }
-                    if media_type not in ALLOWED_IMAGE_TYPES:
+                    if media_type not in _ALLOWED_IMAGE_TYPES:
                         media_type = "image/png"
 
                     try:
-                        # Decode image
-                        image_bytes = b64decode(data)
-
-                        # Generate content hash for deduplication
-                        content_hash = hashlib.sha256(image_bytes).hexdigest()[:12]
+                        # Hash the base64 text so a duplicate needs no decoding
+                        content_hash = hashlib.sha256(
+                            data.encode("ascii") if isinstance(data, str) else data
+                        ).hexdigest()[:12]
 
                         # Determine file extension
-                        ext = mimetypes.guess_extension(media_type) or ".png"
-                        if ext == ".jpe":
-                            ext = ".jpg"
+                        ext = _EXT_BY_MEDIA_TYPE[media_type]
 
                         # Filename includes user message position for correlation
                         filename = f"user{user_msg_idx}_{content_hash}_{block_idx}{ext}"
-                        filepath = images_dir / filename
 
-                        # Save image (skip if exists - deduplication)
-                        if not filepath.exists():
-                            filepath.write_bytes(image_bytes)
+                        # Save image (skip decoding if exists - deduplication)
+                        size = _save_image(images_dir, filename, data)
 
                         # Record reference
                         images_in_msg.append({
                             "type": "image",
                             "path": f"images/{session_id}/{filename}",
                             "media_type": media_type,
-                            "size": len(image_bytes),
+                            "size": size,
                             "index": block_idx
                         })
 
@@ -488,144 +682,247 @@ def extract_images_from_transcript(
     return image_refs_by_msg
 
 
-def update_session_with_images(
+def match_images_to_prompts(
     session_path: Path,
     image_refs_by_msg: Dict[int, List[Dict[str, Any]]]
-) -> None:
+) -> Dict[str, List[Dict[str, Any]]]:
     """
-    Add image references to UserPromptSubmit events in the session file.
+    Map transcript image references onto UserPromptSubmit event IDs.
 
     This correlates user messages from Claude's transcript with our logged
     events by sequence position. The 1st user message maps to the 1st
-    UserPromptSubmit, etc.
+    UserPromptSubmit, etc. Prompts that already have images (inline or from
+    an earlier ImagesPatch) are skipped.
 
     Args:
         session_path: Path to session JSONL file
         image_refs_by_msg: Mapping of user message index to image references
+
+    Returns:
+        Mapping of UserPromptSubmit event ID to image references
     """
     if not image_refs_by_msg or not session_path.exists():
-        return
+        return {}
 
-    try:
-        # Read all events
-        lines = session_path.read_text().strip().split("\n")
-        events = []
-        user_prompt_indices = []  # Track positions of UserPromptSubmit events
+    prompt_ids = []  # UserPromptSubmit event IDs in order
+    has_images = set()
 
-        for i, line in enumerate(lines):
+    with open(session_path, "rb", buffering=READ_BUFFER) as f:
+        for line in f:
             if not line.strip():
                 continue
-            event = json.loads(line)
-            events.append(event)
-
-            if event.get("type") == "UserPromptSubmit":
-                user_prompt_indices.append(len(events) - 1)
-
-        # Match UserPromptSubmit events to transcript user messages by position
-        # and add image references
-        updated = False
-        for msg_idx, image_refs in image_refs_by_msg.items():
-            # Check if we have a corresponding UserPromptSubmit
-            if msg_idx < len(user_prompt_indices):
-                event_idx = user_prompt_indices[msg_idx]
-                event = events[event_idx]
-
-                # Only update if images not already set
-                if "images" not in event:
-                    event["images"] = image_refs
-                    updated = True
-
-        # Rewrite file if we made updates
-        if updated:
-            with open(session_path, "w") as f:
-                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
-                try:
-                    for event in events:
-                        f.write(json.dumps(event, ensure_ascii=False) + "\n")
-                finally:
-                    fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            event = _loads(line)
+            event_type = event.get("type")
+
+            if event_type == "UserPromptSubmit":
+                prompt_ids.append(event.get("id"))
+                if "images" in event:
+                    has_images.add(event.get("id"))
+            elif event_type == "ImagesPatch":
+                has_images.add(event.get("target_event_id"))
+
+    return {
+        prompt_ids[msg_idx]: image_refs
+        for msg_idx, image_refs in image_refs_by_msg.items()
+        if msg_idx < len(prompt_ids) and prompt_ids[msg_idx] not in has_images
+    }
 
-    except Exception as e:
-        log_error(e, "UpdateSessionImages")
 
+def build_image_patches(
+    image_refs_by_event: Dict[str, List[Dict[str, Any]]],
+    session_id: str,
+    agent_session_num: int,
+    ts: str
+) -> List[Dict[str, Any]]:
+    """
+    Build ImagesPatch records attaching image references to UserPromptSubmit events.
+
+    Rather than rewriting the whole JSONL, one patch per prompt is appended.
+    Readers fold patches into their target events.
+
+    Args:
+        image_refs_by_event: Mapping of UserPromptSubmit event ID to image references
+        session_id: Session the patches belong to
+        agent_session_num: Current agent session number
+        ts: Timestamp for the patch records
+    """
+    return [
+        {
+            "id": f"evt_{uuid.uuid4().hex[:12]}",
+            "type": "ImagesPatch",
+            "ts": ts,
+            "session_id": session_id,
+            "agent_session_num": agent_session_num,
+            "target_event_id": event_id,
+            "images": image_refs,
+        }
+        for event_id, image_refs in image_refs_by_event.items()
+    ]
+
+
+def fold_image_patches(events: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Apply ImagesPatch records to their target events and drop the patches."""
+    patches = {}
+    folded = []
+    for event in events:
+        if event.get("type") == "ImagesPatch":
+            patches.setdefault(event.get("target_event_id"), event.get("images", []))
+        else:
+            folded.append(event)
+
+    if patches:
+        for event in folded:
+            if event.get("id") in patches and "images" not in event:
+                event["images"] = patches[event["id"]]
 
+    return folded
 
 
 def get_subagent_info(transcript_path: str) -> Dict[str, Any]:
     """Extract model, tools, and response from subagent transcript."""
     try:
-        lines = Path(transcript_path).read_text().strip().split("\n")
         model, tools, responses = "", [], []
 
-        for line in lines:
-            if not line.strip():
-                continue
-            data = json.loads(line)
-
-            # Get model from first entry
-            if not model:
-                m = data.get("message", {}).get("model", "")
-                if "opus" in m:
-                    model = "opus"
-                elif "sonnet" in m:
-                    model = "sonnet"
-                elif "haiku" in m:
-                    model = "haiku"
-
-            # Extract tools and text from all entries
-            for block in data.get("message", {}).get("content", []):
-                if block.get("type") == "tool_use":
-                    name = block.get("name", "?")
-                    inp = block.get("input", {})
-                    preview = ""
-                    for k in ("file_path", "pattern", "query", "command"):
-                        if k in inp:
-                            preview = str(inp[k])[:60]
-                            break
-                    tools.append(f"- {name} `{preview}`" if preview else f"- {name}")
-                elif block.get("type") == "text":
-                    text = block.get("text", "").strip()
-                    if text:
-                        responses.append(text)
+        with open(transcript_path, "rb", buffering=READ_BUFFER) as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                data = _loads(line)
+
+                # Get model from first entry
+                if not model:
+                    m = data.get("message", {}).get("model", "")
+                    if "opus" in m:
+                        model = "opus"
+                    elif "sonnet" in m:
+                        model = "sonnet"
+                    elif "haiku" in m:
+                        model = "haiku"
+
+                # Extract tools and text from all entries
+                for block in data.get("message", {}).get("content", []):
+                    if block.get("type") == "tool_use":
+                        name = block.get("name", "?")
+                        inp = block.get("input", {})
+                        preview = ""
+                        for k in ("file_path", "pattern", "query", "command"):
+                            if k in inp:
+                                preview = str(inp[k])[:60]
+                                break
+                        tools.append(f"- {name} `{preview}`" if preview else f"- {name}")
+                    elif block.get("type") == "text":
+                        text = block.get("text", "").strip()
+                        if text:
+                            responses.append(text)
 
         return {"model": model, "tools": tools, "response": "\n\n".join(responses)}
     except Exception:
         return {"model": "", "tools": [], "response": ""}
 
 
-def generate_markdown(jsonl_path: Path, md_path: Path, session_id: str) -> None:
-    """Generate human-readable markdown report from JSONL source."""
+def _load_markdown_state(state_path: Path, jsonl_path: Path, md_path: Path) -> Optional[dict]:
+    """
+    Load the saved markdown render state, if rendering can resume from it.
+
+    Returns None when there is no state, or when the markdown or JSONL no
+    longer match it (markdown edited/deleted, JSONL truncated or rewritten).
+    """
     try:
-        events = [
-            json.loads(line) for line in jsonl_path.read_text().strip().split("\n") if line
-        ]
+        saved = _loads(state_path.read_bytes())
+        if md_path.stat().st_size != saved["md_size"]:
+            return None
+
+        offset = saved["offset"]
+        with open(jsonl_path, "rb") as f:
+            f.seek(max(0, offset - MD_STATE_TAIL))
+            tail = f.read(min(offset, MD_STATE_TAIL))
+        if hashlib.sha1(tail).hexdigest() != saved["tail"]:
+            return None
+
+        return saved
     except Exception:
-        return
+        return None
+
+
+def generate_markdown(jsonl_path: Path, md_path: Path, session_id: str) -> None:
+    """
+    Generate human-readable markdown report from JSONL source.
+
+    Rendering is incremental: a {session_id}.mdstate sidecar remembers how far
+    into the JSONL the markdown got, plus the exchange still in progress, so
+    each call only renders events appended since the last one. Hooks for one
+    session run concurrently, so the whole load-render-save cycle holds an
+    flock on the markdown file; otherwise two hooks could append the same
+    section.
+    """
+    with open(md_path, "ab") as md:
+        fcntl.flock(md.fileno(), fcntl.LOCK_EX)
+        try:
+            _render_markdown(jsonl_path, md_path, md, session_id)
+        finally:
+            fcntl.flock(md.fileno(), fcntl.LOCK_UN)
+
 
-    if not events:
+def _render_markdown(jsonl_path: Path, md_path: Path, md: BinaryIO, session_id: str) -> None:
+    """Render new JSONL events into the open (and locked) markdown file."""
+    state_path = md_path.with_suffix(".mdstate")
+
+    try:
+        st = os.stat(jsonl_path)
+        saved = _load_markdown_state(state_path, jsonl_path, md_path)
+        if saved and saved["size"] == st.st_size and saved["mtime_ns"] == st.st_mtime_ns:
+            return  # Nothing new since the last render
+
+        offset = saved["offset"] if saved else 0
+        raw_events = []
+        with open(jsonl_path, "rb", buffering=READ_BUFFER) as f:
+            f.seek(offset)
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # Partial write, render it next time
+                offset += len(line)
+                if line.strip():
+                    raw_events.append(_loads(line))
+        events = fold_image_patches(raw_events)
+    except Exception:
         return
 
-    # Get agent session from first event
-    agent_session = events[0].get("agent_session_num", 0)
+    out = bytearray()
 
-    # Build session label
-    session_label = f"{session_id[:8]}:{agent_session}"
+    def w(*parts: str) -> None:
+        """Append lines to the markdown buffer."""
+        for part in parts:
+            out.extend(part.encode("utf-8"))
+            out.append(0x0A)
 
-    lines = [
-        f"# Session {session_label}",
-        f"**ID:** `{session_id}`",
-        f"**Agent Session:** {agent_session} (context resets)",
-        f"**Started:** {events[0]['ts'][:19].replace('T', ' ')}",
-        "",
-        "---",
-        "",
-    ]
+    if saved:
+        state = saved["state"]
+    else:
+        if not events:
+            return
+
+        # Get agent session from first event
+        agent_session = events[0].get("agent_session_num", 0)
+
+        # Build session label
+        session_label = f"{session_id[:8]}:{agent_session}"
+
+        w(
+            f"# Session {session_label}",
+            f"**ID:** `{session_id}`",
+            f"**Agent Session:** {agent_session} (context resets)",
+            f"**Started:** {events[0]['ts'][:19].replace('T', ' ')}",
+            "",
+            "---",
+            "",
+        )
+        state = {"prompt": None, "tools": {}, "tool_details": [], "subagents": []}
 
     # Process events into exchanges (prompt → stop cycles)
-    prompt = None
-    tools: Counter = Counter()
-    tool_details: List[str] = []
-    subagents: List[Dict] = []
+    prompt = state["prompt"]
+    tools: Dict[str, int] = state["tools"]
+    tool_details: List[str] = state["tool_details"]
+    subagents: List[Dict] = state["subagents"]
 
     for e in events:
         t, d, ts = e["type"], e.get("data", {}), e["ts"][11:19]
@@ -633,7 +930,7 @@ def generate_markdown(jsonl_path: Path, md_path: Path, session_id: str) -> None:
         if t == "UserPromptSubmit":
             # Start new exchange
             prompt = (ts, d.get("prompt", ""))
-            tools = Counter()
+            tools = {}
             tool_details = []
             subagents = []
 
@@ -645,7 +942,7 @@ def generate_markdown(jsonl_path: Path, md_path: Path, session_id: str) -> None:
 
         elif t == "PostToolUse" and prompt:
             tool_name = d.get("tool_name", "?")
-            tools[tool_name] += 1
+            tools[tool_name] = tools.get(tool_name, 0) + 1
 
             # Render AskUserQuestion Q&A inline
             if tool_name == "AskUserQuestion":
@@ -675,11 +972,13 @@ def generate_markdown(jsonl_path: Path, md_path: Path, session_id: str) -> None:
             # Complete the exchange
             if prompt:
                 ts_prompt, text = prompt
-                lines.extend(["", "---", "", f"`{ts_prompt}` 🍄 User", quote(text), ""])
+                w("", "---", "", f"`{ts_prompt}` 🍄 User", quote(text), "")
 
                 if tools:
-                    summary = ", ".join(f"{n} ({c})" for n, c in tools.most_common())
-                    lines.extend([
+                    summary = ", ".join(
+                        f"{n} ({c})" for n, c in sorted(tools.items(), key=lambda kv: -kv[1])
+                    )
+                    w(
                         "<details>",
                         f"<summary>📦 {sum(tools.values())} tools: {summary}</summary>",
                         "",
@@ -687,7 +986,7 @@ def generate_markdown(jsonl_path: Path, md_path: Path, session_id: str) -> None:
                         "",
                         "</details>",
                         "",
-                    ])
+                    )
 
                 if subagents:
                     for sa in subagents:
@@ -695,21 +994,21 @@ def generate_markdown(jsonl_path: Path, md_path: Path, session_id: str) -> None:
                         sa_label = f"`{sa['ts']}` 🔵 Subagent {sa['id']}{model_tag}"
 
                         if sa.get("tools") or sa.get("response"):
-                            lines.extend(["<details>", f"<summary>{sa_label}</summary>", ""])
+                            w("<details>", f"<summary>{sa_label}</summary>", "")
                             if sa.get("tools"):
-                                lines.append(f"**Tools:** {len(sa['tools'])}")
-                                lines.extend(sa["tools"])
-                                lines.append("")
+                                w(f"**Tools:** {len(sa['tools'])}")
+                                w(*sa["tools"])
+                                w("")
                             if sa.get("response"):
-                                lines.extend(["**Response:**", quote(sa["response"][:500]), ""])
-                            lines.extend(["</details>", ""])
+                                w("**Response:**", quote(sa["response"][:500]), "")
+                            w("</details>", "")
                         else:
-                            lines.append(sa_label)
+                            w(sa_label)
 
                 prompt = None
 
             response = d.get("response", "")
-            lines.extend([
+            w(
                 "<details>",
                 f"<summary>`{ts}` 🌲 Claude</summary>",
                 "",
@@ -717,7 +1016,7 @@ def generate_markdown(jsonl_path: Path, md_path: Path, session_id: str) -> None:
                 "",
                 "</details>",
                 "",
-            ])
+            )
 
         elif t == "SubagentStop" and prompt is None:
             # Subagent outside of an exchange
@@ -728,23 +1027,53 @@ def generate_markdown(jsonl_path: Path, md_path: Path, session_id: str) -> None:
             sa_label = f"`{ts}` 🔵 Subagent {agent_id}{model_tag}"
 
             if info.get("tools") or info.get("response"):
-                lines.extend(["<details>", f"<summary>{sa_label}</summary>", ""])
+                w("<details>", f"<summary>{sa_label}</summary>", "")
                 if info.get("tools"):
-                    lines.append(f"**Tools:** {len(info['tools'])}")
-                    lines.extend(info["tools"])
-                    lines.append("")
+                    w(f"**Tools:** {len(info['tools'])}")
+                    w(*info["tools"])
+                    w("")
                 if info.get("response"):
-                    lines.extend(["**Response:**", quote(info["response"][:500]), ""])
-                lines.extend(["</details>", ""])
+                    w("**Response:**", quote(info["response"][:500]), "")
+                w("</details>", "")
             else:
-                lines.append(sa_label)
+                w(sa_label)
 
         elif t in ("SessionStart", "SessionEnd", "Notification", "PreCompact"):
             info = d.get("source") or d.get("message") or ""
             emoji = EMOJIS.get(t, "•")
-            lines.append(f"`{ts}` {emoji} {t} {info}".rstrip())
-
-    md_path.write_text("\n".join(lines) + "\n")
+            w(f"`{ts}` {emoji} {t} {info}".rstrip())
+
+    if not saved:
+        md.truncate(0)  # Full re-render
+    md.write(out)
+    md.flush()
+    md_size = md.tell()
+
+    # Remember where rendering stopped and the exchange still in progress
+    with open(jsonl_path, "rb") as f:
+        f.seek(max(0, offset - MD_STATE_TAIL))
+        tail = f.read(min(offset, MD_STATE_TAIL))
+    payload = _dumps({
+        "offset": offset,
+        "size": st.st_size,
+        "mtime_ns": st.st_mtime_ns,
+        "md_size": md_size,
+        "tail": hashlib.sha1(tail).hexdigest(),
+        "state": {
+            "prompt": prompt,
+            "tools": tools,
+            "tool_details": tool_details,
+            "subagents": subagents,
+        },
+    })
+    # Replace the sidecar atomically so a crash never leaves a torn state file
+    tmp_path = state_path.with_name(f".{state_path.name}.{os.getpid()}.tmp")
+    try:
+        tmp_path.write_bytes(payload)
+        os.replace(tmp_path, state_path)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
 
 
 def process_event(event_type: str, stdin_data: dict) -> dict:
@@ -764,13 +1093,14 @@ def process_event(event_type: str, stdin_data: dict) -> dict:
     md_path = session_path.with_suffix(".md")
 
     # Build event
-    ts = datetime.now(timezone.utc)
+    # Format the timestamp once; the Stop path reuses it for the response event
+    ts = datetime.now(timezone.utc).isoformat()
     event_id = f"evt_{uuid.uuid4().hex[:12]}"
     agent_session_num = get_agent_session_num(session_path, source)
     event = {
         "id": event_id,
         "type": event_type,
-        "ts": ts.isoformat(),
+        "ts": ts,
         "session_id": session_id,
         "agent_session_num": agent_session_num,
         "data": data,
@@ -804,13 +1134,19 @@ def process_event(event_type: str, stdin_data: dict) -> dict:
         transcript_path = data["transcript_path"]
         events_to_write = [event]
 
+        # Parse the transcript once for both the response and image extraction
+        try:
+            transcript = _load_transcript(transcript_path)
+        except Exception:
+            transcript = transcript_path
+
         # Capture response immediately - transcript should already be written
-        response = get_response(transcript_path)
+        response = get_response(transcript)
         if response:
             assistant_event = {
                 "id": f"evt_{uuid.uuid4().hex[:12]}",
                 "type": "AssistantResponse",
-                "ts": ts.isoformat(),
+                "ts": ts,
                 "session_id": session_id,
                 "agent_session_num": agent_session_num,
                 "data": {"response": response},
@@ -818,20 +1154,22 @@ def process_event(event_type: str, stdin_data: dict) -> dict:
             }
             events_to_write.append(assistant_event)
 
-        # Write both events atomically in single file operation
-        append_events(session_path, events_to_write)
-
-        # Extract images from transcript and update prior UserPromptSubmit events
+        # Extract images from transcript and patch prior UserPromptSubmit events
         # Claude Code doesn't pass image data to hooks, so we extract from the
         # transcript after the conversation turn is complete
         try:
             image_refs_by_msg = extract_images_from_transcript(
-                transcript_path, storage_path, session_id
+                transcript, storage_path, session_id
             )
-            if image_refs_by_msg:
-                update_session_with_images(session_path, image_refs_by_msg)
+            image_refs_by_event = match_images_to_prompts(session_path, image_refs_by_msg)
+            events_to_write.extend(build_image_patches(
+                image_refs_by_event, session_id, agent_session_num, ts
+            ))
         except Exception as e:
             log_error(e, "ImageExtractionFromTranscript")
+
+        # Write the events and any image patches in a single write()
+        append_events(session_path, events_to_write)
     else:
         # Non-Stop events: write normally
         append_event(session_path, event)
@@ -867,24 +1205,37 @@ def log_error(error: Exception, event_type: str) -> None:
         pass  # Silently fail - never block Claude
 
 
+def _parse_event_arg(argv: List[str]) -> Optional[str]:
+    """Get the event type from -e/--event (argparse costs more to import than the hook's work)."""
+    for i, arg in enumerate(argv):
+        if arg in ("-e", "--event"):
+            return argv[i + 1] if i + 1 < len(argv) else None
+        if arg.startswith("--event="):
+            return arg[len("--event="):]
+        if arg.startswith("-e") and len(arg) > 2:
+            return arg[2:]
+    return None
+
+
 def main():
     """Entry point for hook execution."""
-    parser = argparse.ArgumentParser(description="Log Claude Code events")
-    parser.add_argument("-e", "--event", required=True, help="Event type")
-    args = parser.parse_args()
+    event = _parse_event_arg(sys.argv[1:])
+    if not event:
+        print("usage: log_event.py -e EVENT", file=sys.stderr)
+        sys.exit(2)
 
     try:
         # Read event data from STDIN
-        stdin_data = json.load(sys.stdin)
+        stdin_data = _loads(sys.stdin.buffer.read())
 
         # Process and store the event
-        process_event(args.event, stdin_data)
+        process_event(event, stdin_data)
 
         # Silent success - don't print anything to stdout/stderr
 
     except Exception as e:
         # Silent failure - log to file but never crash
-        log_error(e, args.event)
+        log_error(e, event)
 
         # Always exit successfully to not block Claude
         sys.exit(0)
@@ -7,14 +7,16 @@ This module provides core functionality for the logging plugin:
 - Embeddings: Local embedding generation
 """
 
+from functools import cache
 from pathlib import Path
 import os
 
 __version__ = "1.0.0"
 
 
+@cache
 def get_storage_path() -> Path:
-    """Get the storage path for logging data."""
+    """Get the storage path for logging data (resolved once per process)."""
     storage_path = os.environ.get("LOGGING_STORAGE_PATH")
     if storage_path:
         return Path(storage_path)
@@ -23,8 +25,9 @@ def get_storage_path() -> Path:
     return Path(project_dir) / ".claude" / "local" / "logging"
 
 
+@cache
 def get_plugin_root() -> Path:
-    """Get the plugin root directory."""
+    """Get the plugin root directory (resolved once per process)."""
     plugin_root = os.environ.get("CLAUDE_PLUGIN_ROOT")
     if plugin_root:
         return Path(plugin_root)
@@ -5,10 +5,34 @@ Provides local embedding generation using sentence-transformers.
 Falls back gracefully when not installed.
 """
 
-from typing import List, Optional, Dict, Any
+from typing import Callable, List, Optional, Dict, Any, Tuple
 from pathlib import Path
+import atexit
 import json
+import os
+import platform
+import queue
 import struct
+import threading
+import time
+
+try:
+    import numpy as np
+except ImportError:
+    np = None  # Pure-Python similarity fallback
+
+try:
+    import faiss
+except ImportError:
+    faiss = None  # FaissEmbeddingStorage falls back to exact search
+
+# int8 dynamic quantization targeting VNNI (falls back gracefully on older x86)
+ONNX_QUANTIZATION = "arm64" if platform.machine().lower() in ("arm64", "aarch64") else "avx512_vnni"
+ONNX_QUANTIZED_FILE = f"model_qint8_{ONNX_QUANTIZATION}.onnx"
+ONNX_CACHE_DIR = Path(os.environ.get(
+    "LOGGING_ONNX_CACHE",
+    Path.home() / ".cache" / "claude-logging" / "onnx"
+))
 
 
 class EmbeddingService:
@@ -19,19 +43,49 @@ class EmbeddingService:
     - 384 dimensions
     - 22MB model size
     - Fast inference (~5000 sentences/sec on CPU)
+
+    Runs the int8-quantized ONNX model when onnxruntime is installed,
+    otherwise the PyTorch model.
     """
 
+    # Requests queued through encode_batch_async are encoded together:
+    # up to BATCH_SIZE texts, waiting at most BATCH_WINDOW seconds for more
+    BATCH_SIZE = 32
+    BATCH_WINDOW = 0.05
+    # Recent single-text embeddings (repeated searches skip the model)
+    QUERY_CACHE_SIZE = 256
+
     def __init__(self, model_name: str = "all-MiniLM-L6-v2"):
         self.model_name = model_name
         self.model = None
         self.dimension = 384  # all-MiniLM-L6-v2 dimension
+        self._query_cache: Dict[str, bytes] = {}  # text -> float32 bytes, oldest first
+        self._query_cache_lock = threading.Lock()
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._worker = None
+        self._worker_lock = threading.Lock()
         self._load_model()
 
     def _load_model(self) -> bool:
         """Attempt to load the embedding model."""
+        # Embeddings from a previous model would be stale
+        with self._query_cache_lock:
+            self._query_cache.clear()
         try:
             from sentence_transformers import SentenceTransformer
-            self.model = SentenceTransformer(self.model_name)
+            try:
+                import torch
+                # One intra-op pool across all cores; encode() has no
+                # independent ops worth a second (inter-op) pool
+                torch.set_num_threads(os.cpu_count() or 4)
+                torch.set_num_interop_threads(1)
+            except ImportError:
+                pass
+            except RuntimeError:
+                pass  # Inter-op pool already started; keep its size
+            self.model = self._load_onnx_model(SentenceTransformer)
+            if self.model is None:
+                self.model = SentenceTransformer(self.model_name)
             self.dimension = self.model.get_sentence_embedding_dimension()
             return True
         except ImportError:
@@ -41,61 +95,198 @@ class EmbeddingService:
             # Model loading failed
             return False
 
+    def _load_onnx_model(self, SentenceTransformer):
+        """
+        Load an int8 dynamically quantized ONNX export of the model.
+
+        Uses the quantized file published with the model when there is one,
+        otherwise exports it once into ONNX_CACHE_DIR. Returns None when
+        onnxruntime is unavailable or the export fails, so the caller falls
+        back to the PyTorch model.
+        """
+        try:
+            import onnxruntime  # noqa: F401
+        except ImportError:
+            return None
+
+        model_kwargs = {"file_name": f"onnx/{ONNX_QUANTIZED_FILE}"}
+        try:
+            return SentenceTransformer(self.model_name, backend="onnx", model_kwargs=model_kwargs)
+        except Exception:
+            pass
+
+        cache_dir = ONNX_CACHE_DIR / self.model_name.replace("/", "__")
+        try:
+            if not (cache_dir / "onnx" / ONNX_QUANTIZED_FILE).exists():
+                from sentence_transformers import export_dynamic_quantized_onnx_model
+                model = SentenceTransformer(self.model_name, backend="onnx")
+                model.save_pretrained(str(cache_dir))
+                export_dynamic_quantized_onnx_model(model, ONNX_QUANTIZATION, str(cache_dir))
+            return SentenceTransformer(str(cache_dir), backend="onnx", model_kwargs=model_kwargs)
+        except Exception:
+            return None
+
     @property
     def is_available(self) -> bool:
         """Check if embeddings are available."""
         return self.model is not None
 
-    def encode(self, texts: List[str]) -> List[List[float]]:
+    def encode(self, texts: List[str]) -> "np.ndarray":
         """
         Generate embeddings for a list of texts.
 
-        Returns empty list if model not available.
+        Returns a (len(texts), dimension) float32 array of unit vectors,
+        or an empty list if model not available.
         """
         if not self.is_available:
             return []
 
-        embeddings = self.model.encode(texts, convert_to_numpy=True)
-        return embeddings.tolist()
+        embeddings = self.model.encode(
+            texts,
+            batch_size=self.BATCH_SIZE,
+            convert_to_numpy=True,
+            normalize_embeddings=True,
+        )
+        return embeddings
 
-    def encode_single(self, text: str) -> Optional[List[float]]:
+    def encode_single(self, text: str) -> Optional["np.ndarray"]:
         """Generate embedding for a single text."""
         if not self.is_available:
             return None
 
+        cached = self._cached_embedding(text)
+        if cached is not None:
+            return cached
+
         result = self.encode([text])
-        return result[0] if result else None
+        if not len(result):
+            return None
+        self._cache_embedding(text, result[0])
+        return result[0]
+
+    def _cached_embedding(self, text: str) -> Optional["np.ndarray"]:
+        """Look up a recent embedding for text (read-only array)."""
+        with self._query_cache_lock:
+            data = self._query_cache.pop(text, None)
+            if data is None:
+                return None
+            self._query_cache[text] = data  # Most recently used goes last
+        return np.frombuffer(data, dtype=np.float32)
+
+    def _cache_embedding(self, text: str, embedding: "np.ndarray") -> None:
+        """Remember an embedding, evicting the least recently used."""
+        data = np.asarray(embedding, dtype=np.float32).tobytes()
+        with self._query_cache_lock:
+            self._query_cache.pop(text, None)
+            if len(self._query_cache) >= self.QUERY_CACHE_SIZE:
+                self._query_cache.pop(next(iter(self._query_cache)))
+            self._query_cache[text] = data
+
+    def encode_batch_async(
+        self,
+        text: str,
+        callback: Callable[[Optional[List[float]]], None]
+    ) -> None:
+        """
+        Queue a text for encoding and return immediately.
 
-    def similarity(self, embedding1: List[float], embedding2: List[float]) -> float:
-        """Calculate cosine similarity between two embeddings."""
-        try:
-            import numpy as np
+        A background worker encodes queued texts in batches and calls
+        callback with each embedding (None if encoding failed).
+        """
+        if not self.is_available:
+            callback(None)
+            return
+
+        cached = self._cached_embedding(text)
+        if cached is not None:
+            callback(cached)
+            return
+
+        with self._worker_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._batch_worker, daemon=True)
+                self._worker.start()
+        self._queue.put((text, callback))
+
+    def _batch_worker(self):
+        """Drain the queue in batches so each model call covers many texts."""
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.BATCH_WINDOW
+            while len(batch) < self.BATCH_SIZE:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            try:
+                embeddings = self.encode([text for text, _ in batch])
+            except Exception:
+                embeddings = []
+
+            for i, (text, callback) in enumerate(batch):
+                embedding = embeddings[i] if i < len(embeddings) else None
+                if embedding is not None:
+                    self._cache_embedding(text, embedding)
+                try:
+                    callback(embedding)
+                except Exception:
+                    pass
 
-            a = np.array(embedding1)
-            b = np.array(embedding2)
+    def similarity(self, embedding1: List[float], embedding2: List[float]) -> float:
+        """
+        Calculate cosine similarity between two embeddings from encode().
 
-            return float(np.dot(a, b) / (np.linalg.norm(a) * np.linalg.norm(b)))
-        except ImportError:
-            # Fallback: manual calculation
-            dot_product = sum(a * b for a, b in zip(embedding1, embedding2))
-            norm1 = sum(a * a for a in embedding1) ** 0.5
-            norm2 = sum(b * b for b in embedding2) ** 0.5
-            return dot_product / (norm1 * norm2) if norm1 and norm2 else 0.0
+        encode() returns unit vectors, so this is just their dot product.
+        """
+        if np is not None:
+            return float(np.dot(embedding1, embedding2))
+        return sum(a * b for a, b in zip(embedding1, embedding2))
 
 
 class EmbeddingStorage:
     """
     Storage for embeddings using sqlite-vec or file-based fallback.
 
-    Uses binary format for efficient storage:
-    - 4 bytes per float32
-    - 384 dimensions = 1.5KB per embedding
+    sqlite-vec stores float32 vectors (4 bytes per dimension). The blob
+    fallback stores int8-quantized vectors with a float32 scale header:
+    - 1 byte per dimension + 4
+    - 384 dimensions = 388 bytes per embedding
+    Older float32 blobs are still read.
+
+    Stored vectors are L2-normalized, so cosine similarity is a dot product.
     """
 
-    def __init__(self, db_path: Path, dimension: int = 384):
+    # PRAGMA user_version; 1 = blob fallback vectors are normalized
+    SCHEMA_VERSION = 1
+    # store() leaves its writes in an open transaction; a background
+    # thread commits them this often (and flush()/close() do so at once)
+    FLUSH_INTERVAL = 0.5
+
+    def __init__(self, db_path: Path, dimension: int = 384, durable: bool = True):
         self.db_path = db_path
         self.dimension = dimension
+        # durable=False skips fsyncs entirely (synchronous=OFF); for bulk
+        # rebuilds whose output can be regenerated after a crash
+        self.durable = durable
         self.conn = None
+
+        # Blob fallback search: normalized vectors as one contiguous matrix (SoA),
+        # with event IDs in a parallel list. Filled lazily from the blob table.
+        self._matrix = np.zeros((0, dimension), dtype=np.float32) if np is not None else None
+        self._ids: List[str] = []
+        self._row_of: Dict[str, int] = {}
+        self._max_rowid = 0
+        self._matrix_lock = threading.Lock()
+
+        self._write_lock = threading.Lock()
+        self._pending = False
+        self._flusher = None
+        self._closed = threading.Event()
+
         self._init_storage()
 
     def _init_storage(self):
@@ -103,22 +294,42 @@ class EmbeddingStorage:
         import sqlite3
 
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        self.conn = sqlite3.connect(str(self.db_path))
-
-        # Try to load sqlite-vec extension
+        # Shared with the API server's worker threads
+        self.conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        # WAL + NORMAL: a commit appends to the log without an fsync per write
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(f"PRAGMA synchronous={'NORMAL' if self.durable else 'OFF'}")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.execute("PRAGMA mmap_size=268435456")  # 256 MiB
+        self.conn.execute("PRAGMA busy_timeout=5000")
+
+        # Try to load sqlite-vec: the pip package bundles the extension,
+        # otherwise look for a system-wide vec0
         try:
             self.conn.enable_load_extension(True)
-            self.conn.load_extension("vec0")
+            try:
+                import sqlite_vec
+                sqlite_vec.load(self.conn)
+            except ImportError:
+                self.conn.load_extension("vec0")
+            self.conn.enable_load_extension(False)
             self._has_vec = True
         except Exception:
             self._has_vec = False
 
+        # A database created by the blob fallback keeps using it
+        row = self.conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'embeddings'"
+        ).fetchone()
+        if row and "VIRTUAL" not in row[0].upper():
+            self._has_vec = False
+
         # Create tables
         if self._has_vec:
             self.conn.execute(f"""
                 CREATE VIRTUAL TABLE IF NOT EXISTS embeddings USING vec0(
                     event_id TEXT PRIMARY KEY,
-                    embedding FLOAT[{self.dimension}]
+                    embedding FLOAT[{self.dimension}] distance_metric=cosine
                 )
             """)
         else:
@@ -141,49 +352,223 @@ class EmbeddingStorage:
             )
         """)
 
+        self._migrate()
         self.conn.commit()
 
+    def _migrate(self):
+        """Bring stored vectors up to SCHEMA_VERSION."""
+        version = self.conn.execute("PRAGMA user_version").fetchone()[0]
+        if version >= self.SCHEMA_VERSION:
+            return
+
+        if not self._has_vec:
+            # Re-normalize vectors stored before encode() normalized them
+            # (sqlite-vec compares by cosine distance and needs no rewrite)
+            rows = self.conn.execute("SELECT event_id, embedding FROM embeddings").fetchall()
+            self.conn.executemany(
+                "UPDATE embeddings SET embedding = ? WHERE event_id = ?",
+                [
+                    (self._quantize_embedding(self._normalize(self._deserialize_embedding(blob))), event_id)
+                    for event_id, blob in rows
+                ]
+            )
+
+        self.conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
+
+    @staticmethod
+    def _normalize(embedding: List[float]) -> List[float]:
+        """Scale an embedding to unit length."""
+        if np is not None:
+            vector = np.asarray(embedding, dtype=np.float32)
+            norm = float(np.linalg.norm(vector))
+            return vector / norm if norm else vector
+        norm = sum(x * x for x in embedding) ** 0.5
+        return [x / norm for x in embedding] if norm else list(embedding)
+
     def _serialize_embedding(self, embedding: List[float]) -> bytes:
         """Serialize embedding to bytes."""
+        if np is not None:
+            return np.asarray(embedding, dtype=np.float32).tobytes()
         return struct.pack(f'{len(embedding)}f', *embedding)
 
-    def _deserialize_embedding(self, data: bytes) -> List[float]:
-        """Deserialize embedding from bytes."""
+    def _quantize_embedding(self, embedding: List[float]) -> bytes:
+        """Serialize embedding as int8 values with a leading float32 scale."""
+        if np is not None:
+            vector = np.asarray(embedding, dtype=np.float32)
+            scale = float(np.abs(vector).max(initial=0.0)) / 127 or 1.0
+            return struct.pack('<f', scale) + np.round(vector / scale).astype(np.int8).tobytes()
+        scale = max((abs(x) for x in embedding), default=0.0) / 127 or 1.0
+        quantized = [round(x / scale) for x in embedding]
+        return struct.pack(f'<f{len(quantized)}b', scale, *quantized)
+
+    def _is_quantized(self, data: bytes) -> bool:
+        """Tell int8 blobs apart from legacy float32 ones by their size."""
+        return len(data) == self.dimension + 4
+
+    def _deserialize_embedding(self, data: bytes) -> "np.ndarray | List[float]":
+        """
+        Deserialize embedding from bytes (int8-quantized or float32).
+
+        With NumPy this is an array: a zero-copy view for float32 blobs, a
+        single float32 array for int8 ones. Without NumPy, a list.
+        """
+        if np is not None:
+            if self._is_quantized(data):
+                scale = np.frombuffer(data, dtype="<f4", count=1)[0]
+                return np.frombuffer(data, dtype=np.int8, offset=4) * scale
+            return np.frombuffer(data, dtype=np.float32)
+        if self._is_quantized(data):
+            scale = struct.unpack_from('<f', data)[0]
+            return [q * scale for q in struct.unpack_from(f'{self.dimension}b', data, 4)]
         count = len(data) // 4
         return list(struct.unpack(f'{count}f', data))
 
+    def _normalized_matrix(self, blobs: List[bytes]) -> "np.ndarray":
+        """Decode blobs into a (len(blobs), dimension) float32 matrix of unit rows."""
+        matrix = np.zeros((len(blobs), self.dimension), dtype=np.float32)
+        quantized = [i for i, blob in enumerate(blobs) if self._is_quantized(blob)]
+        legacy = [i for i, blob in enumerate(blobs) if not self._is_quantized(blob)]
+
+        for rows, dtype, skip in ((quantized, np.int8, 4), (legacy, np.float32, 0)):
+            if not rows:
+                continue
+            raw = np.frombuffer(b"".join(blobs[i] for i in rows), dtype=np.uint8)
+            raw = raw.reshape(len(rows), -1)
+            # The per-vector scale cancels out once rows are normalized
+            matrix[rows] = raw[:, skip:].copy().view(dtype)
+
+        norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        matrix /= norms
+        return matrix
+
+    def _refresh_matrix(self) -> None:
+        """
+        Bring the in-memory embedding matrix up to date with the blob table.
+
+        Every write gets a new, higher rowid (INSERT OR REPLACE deletes and
+        reinserts), so only rows past the last seen rowid need decoding.
+        """
+        max_rowid = self.conn.execute("SELECT MAX(rowid) FROM embeddings").fetchone()[0] or 0
+        if max_rowid == self._max_rowid:
+            return
+
+        rows = self.conn.execute(
+            "SELECT event_id, embedding FROM embeddings WHERE rowid > ?",
+            (self._max_rowid,)
+        ).fetchall()
+        vectors = self._normalized_matrix([row[1] for row in rows])
+
+        for (event_id, _), vector in zip(rows, vectors):
+            idx = self._row_of.get(event_id)
+            if idx is None:
+                idx = len(self._ids)
+                if idx == len(self._matrix):
+                    # Grow by doubling so appends stay amortized O(1)
+                    grown = np.zeros((max(64, 2 * idx), self.dimension), dtype=np.float32)
+                    grown[:idx] = self._matrix
+                    self._matrix = grown
+                self._ids.append(event_id)
+                self._row_of[event_id] = idx
+            self._matrix[idx] = vector
+
+        self._max_rowid = max_rowid
+
+    def _top_similar(self, query_embedding: List[float], limit: int) -> List[tuple]:
+        """Find the most similar (event_id, score) pairs with one matrix-vector product."""
+        with self._matrix_lock:
+            self._refresh_matrix()
+            count = len(self._ids)
+            if not count or limit <= 0:
+                return []
+
+            query = np.asarray(query_embedding, dtype=np.float32)
+            query = query / (np.linalg.norm(query) or 1.0)
+            scores = self._matrix[:count] @ query
+
+            if limit < count:
+                top = np.argpartition(-scores, limit)[:limit]
+            else:
+                top = np.arange(count)
+            top = top[np.argsort(-scores[top])]
+            return [(self._ids[i], float(scores[i])) for i in top]
+
     def store(
         self,
         event_id: str,
         embedding: List[float],
         metadata: Dict[str, Any]
     ) -> None:
-        """Store an embedding with metadata."""
-        if self._has_vec:
-            self.conn.execute(
-                "INSERT OR REPLACE INTO embeddings (event_id, embedding) VALUES (?, ?)",
-                (event_id, embedding)
-            )
-        else:
-            blob = self._serialize_embedding(embedding)
-            self.conn.execute(
-                "INSERT OR REPLACE INTO embeddings (event_id, embedding) VALUES (?, ?)",
-                (event_id, blob)
-            )
+        """
+        Store an embedding with metadata.
 
-        self.conn.execute("""
-            INSERT OR REPLACE INTO embedding_metadata
-            (event_id, session_id, event_type, content, timestamp)
-            VALUES (?, ?, ?, ?, ?)
-        """, (
-            event_id,
-            metadata.get("session_id", ""),
-            metadata.get("event_type", ""),
-            metadata.get("content", ""),
-            metadata.get("timestamp", ""),
-        ))
+        The write is committed by the background flusher within
+        FLUSH_INTERVAL, batched with any other stores in that window.
+        """
+        self.store_many([(event_id, embedding, metadata)])
+
+    def store_many(self, rows: List[Tuple[str, List[float], Dict[str, Any]]]) -> None:
+        """Store (event_id, embedding, metadata) rows with one executemany per table."""
+        if not rows:
+            return
+
+        embedding_rows = []
+        metadata_rows = []
+        for event_id, embedding, metadata in rows:
+            embedding = self._normalize(embedding)
+            if self._has_vec:
+                blob = self._serialize_embedding(embedding)
+            else:
+                blob = self._quantize_embedding(embedding)
+            embedding_rows.append((event_id, blob))
+            metadata_rows.append((
+                event_id,
+                metadata.get("session_id", ""),
+                metadata.get("event_type", ""),
+                metadata.get("content", ""),
+                metadata.get("timestamp", ""),
+            ))
+
+        with self._write_lock:
+            if self._has_vec:
+                # vec0 tables don't support INSERT OR REPLACE
+                self.conn.executemany(
+                    "DELETE FROM embeddings WHERE event_id = ?",
+                    [(event_id,) for event_id, _ in embedding_rows]
+                )
+                self.conn.executemany(
+                    "INSERT INTO embeddings (event_id, embedding) VALUES (?, ?)",
+                    embedding_rows
+                )
+            else:
+                self.conn.executemany(
+                    "INSERT OR REPLACE INTO embeddings (event_id, embedding) VALUES (?, ?)",
+                    embedding_rows
+                )
 
-        self.conn.commit()
+            self.conn.executemany("""
+                INSERT OR REPLACE INTO embedding_metadata
+                (event_id, session_id, event_type, content, timestamp)
+                VALUES (?, ?, ?, ?, ?)
+            """, metadata_rows)
+            self._pending = True
+
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_loop, daemon=True)
+                self._flusher.start()
+                atexit.register(self.flush)
+
+    def flush(self) -> None:
+        """Commit pending writes."""
+        with self._write_lock:
+            if self._pending and self.conn:
+                self.conn.commit()
+                self._pending = False
+
+    def _flush_loop(self):
+        """Commit pending writes every FLUSH_INTERVAL until closed."""
+        while not self._closed.wait(self.FLUSH_INTERVAL):
+            self.flush()
 
     def search(
         self,
@@ -197,69 +582,48 @@ class EmbeddingStorage:
         Returns list of dicts with event_id, score, and metadata.
         """
         if self._has_vec:
-            # Use sqlite-vec for fast vector search
-            cursor = self.conn.execute(f"""
+            # Use sqlite-vec for fast vector search (KNN runs inside the extension)
+            cursor = self.conn.execute("""
                 SELECT
-                    e.event_id,
-                    distance,
+                    v.event_id,
+                    v.distance,
                     m.session_id,
                     m.event_type,
                     m.content,
                     m.timestamp
-                FROM embeddings e
-                JOIN embedding_metadata m ON e.event_id = m.event_id
-                WHERE embedding MATCH ?
-                ORDER BY distance
-                LIMIT ?
-            """, (query_embedding, limit))
+                FROM (
+                    SELECT event_id, distance
+                    FROM embeddings
+                    WHERE embedding MATCH ? AND k = ?
+                ) v
+                JOIN embedding_metadata m ON v.event_id = m.event_id
+                ORDER BY v.distance
+            """, (self._serialize_embedding(query_embedding), limit))
         else:
             # Fallback: brute-force search
-            cursor = self.conn.execute("""
-                SELECT event_id, embedding FROM embeddings
-            """)
-
             results = []
-            for row in cursor:
-                event_id = row[0]
-                embedding = self._deserialize_embedding(row[1])
-
-                # Calculate cosine similarity
-                dot_product = sum(a * b for a, b in zip(query_embedding, embedding))
-                norm1 = sum(a * a for a in query_embedding) ** 0.5
-                norm2 = sum(b * b for b in embedding) ** 0.5
-                score = dot_product / (norm1 * norm2) if norm1 and norm2 else 0.0
-
-                results.append((event_id, score))
+            if np is not None:
+                results = self._top_similar(query_embedding, limit)
+            else:
+                # Stored vectors are unit length: cosine similarity is the dot product
+                query = self._normalize(query_embedding)
+                cursor = self.conn.execute("""
+                    SELECT event_id, embedding FROM embeddings
+                """)
+                for row in cursor:
+                    embedding = self._deserialize_embedding(row[1])
+                    results.append((row[0], sum(a * b for a, b in zip(query, embedding))))
 
             # Sort by similarity (descending)
             results.sort(key=lambda x: -x[1])
             results = results[:limit]
 
-            # Fetch metadata for top results
-            final_results = []
-            for event_id, score in results:
-                meta_cursor = self.conn.execute("""
-                    SELECT session_id, event_type, content, timestamp
-                    FROM embedding_metadata
-                    WHERE event_id = ?
-                """, (event_id,))
-                meta = meta_cursor.fetchone()
-                if meta:
-                    final_results.append({
-                        "event_id": event_id,
-                        "score": score,
-                        "session_id": meta[0],
-                        "event_type": meta[1],
-                        "content": meta[2],
-                        "timestamp": meta[3],
-                    })
-
-            return final_results
+            return self._with_metadata(results)
 
         return [
             {
                 "event_id": row[0],
-                "score": 1 - row[1],  # Convert distance to similarity
+                "score": 1 - row[1],  # Convert cosine distance to similarity
                 "session_id": row[2],
                 "event_type": row[3],
                 "content": row[4],
@@ -268,7 +632,252 @@ class EmbeddingStorage:
             for row in cursor
         ]
 
+    def _with_metadata(self, results: List[tuple]) -> List[Dict[str, Any]]:
+        """Attach metadata to ranked (event_id, score) pairs, keeping their order."""
+        # One query per 500 IDs keeps us under SQLite's bound-variable limit
+        metadata = {}
+        event_ids = [event_id for event_id, _ in results]
+        for start in range(0, len(event_ids), 500):
+            chunk = event_ids[start:start + 500]
+            placeholders = ",".join("?" * len(chunk))
+            for row in self.conn.execute(f"""
+                SELECT event_id, session_id, event_type, content, timestamp
+                FROM embedding_metadata
+                WHERE event_id IN ({placeholders})
+            """, chunk):
+                metadata[row[0]] = row
+
+        final_results = []
+        for event_id, score in results:
+            meta = metadata.get(event_id)
+            if meta:
+                final_results.append({
+                    "event_id": event_id,
+                    "score": score,
+                    "session_id": meta[1],
+                    "event_type": meta[2],
+                    "content": meta[3],
+                    "timestamp": meta[4],
+                })
+        return final_results
+
     def close(self):
-        """Close database connection."""
+        """Commit pending writes and close database connection."""
+        self._closed.set()
+        if self._flusher is not None:
+            self._flusher.join()
+            atexit.unregister(self.flush)
+        self.flush()
         if self.conn:
             self.conn.close()
+            self.conn = None
+
+
+class FaissEmbeddingStorage(EmbeddingStorage):
+    """
+    EmbeddingStorage that answers searches from a FAISS IVF-PQ index once
+    the store holds FAISS_MIN_VECTORS vectors.
+
+    Vectors and metadata stay in SQLite; the index is derived from them and
+    persisted next to the database. FAISS ids are the embeddings table rowids,
+    so an id resolves to its event_id with a lookup, and the entries left
+    behind by replaced rows no longer resolve. Smaller stores (or a missing
+    faiss install) use the exact EmbeddingStorage search.
+    """
+
+    FAISS_MIN_VECTORS = 100_000
+    TRAIN_SIZE = 10_000
+    PQ_SUBQUANTIZERS = 48  # 384 / 48 = 8 dimensions per 1-byte code
+    PQ_BITS = 8
+    NPROBE = 16
+    RERANK_FACTOR = 10  # PQ candidates re-scored per requested result
+    ADD_BATCH = 10_000
+    SAVE_INTERVAL = 300.0  # seconds between background index saves
+
+    def __init__(self, db_path: Path, dimension: int = 384, durable: bool = True):
+        self.index_path = db_path.with_suffix(".faiss")
+        self._index = None
+        self._quantizer = None  # The IVF index built here doesn't own it
+        self._indexed_rowid = 0
+        self._index_lock = threading.Lock()  # Guards _index for search vs. add
+        self._build_lock = threading.Lock()  # One builder at a time
+        self._builder: Optional[threading.Thread] = None
+        self._dirty = False  # In-memory index has vectors the saved one lacks
+        self._last_save = time.monotonic()
+        self._counted_rowid = -1  # MAX(rowid) when _count was taken
+        self._count = 0
+        super().__init__(db_path, dimension, durable)
+        self._load_index()
+        atexit.register(self._save_if_dirty)
+
+    def _load_index(self) -> None:
+        """Load a persisted index and the rowid it covers."""
+        if faiss is None or not self.index_path.exists():
+            return
+        try:
+            state = json.loads(self.index_path.with_suffix(".faiss.json").read_text())
+            self._index = faiss.read_index(str(self.index_path))
+            self._index.nprobe = self.NPROBE
+            self._indexed_rowid = state["max_rowid"]
+        except (OSError, ValueError, KeyError, RuntimeError):
+            self._index = None
+            self._indexed_rowid = 0
+
+    def _save_index(self) -> None:
+        """Persist the index, then the rowid it covers (builder only)."""
+        tmp_index = self.index_path.with_suffix(".faiss.tmp")
+        faiss.write_index(self._index, str(tmp_index))
+        os.replace(tmp_index, self.index_path)
+        state_path = self.index_path.with_suffix(".faiss.json")
+        tmp_path = state_path.with_suffix(".tmp")
+        tmp_path.write_text(json.dumps({"max_rowid": self._indexed_rowid}))
+        os.replace(tmp_path, state_path)
+        self._dirty = False
+        self._last_save = time.monotonic()
+
+    def _save_if_dirty(self) -> None:
+        """Persist vectors added since the last save, if any."""
+        with self._build_lock:
+            if self._dirty and self._index is not None:
+                self._save_index()
+
+    def _vectors_after(self, rowid: int, limit: Optional[int] = None) -> tuple:
+        """Read (rowids, unit vectors) for rows past rowid, in rowid order."""
+        sql = "SELECT rowid, embedding FROM embeddings WHERE rowid > ? ORDER BY rowid"
+        params = [rowid]
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        rows = self.conn.execute(sql, params).fetchall()
+        ids = np.fromiter((row[0] for row in rows), dtype=np.int64, count=len(rows))
+        return ids, self._normalized_matrix([row[1] for row in rows])
+
+    def _needs_build(self) -> bool:
+        """Whether there is an index to train or vectors to add to it."""
+        # MAX(rowid) is a single b-tree seek, unlike COUNT(*)
+        max_rowid = self.conn.execute("SELECT MAX(rowid) FROM embeddings").fetchone()[0] or 0
+        if self._index is not None:
+            return max_rowid > self._indexed_rowid
+
+        # Rowids are distinct positive integers, so the count can't exceed
+        # the largest one; only count once that could reach the threshold,
+        # and again only after rows were added
+        if max_rowid < self.FAISS_MIN_VECTORS:
+            return False
+        if max_rowid != self._counted_rowid:
+            self._count = self.conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            self._counted_rowid = max_rowid
+        return self._count >= self.FAISS_MIN_VECTORS
+
+    def build_index(self, save: bool = True) -> bool:
+        """
+        Train the index or add new vectors to it; return whether it is usable.
+
+        Blocking: search() runs this on a background thread, the backfill
+        script calls it directly. Searches keep running meanwhile, on the
+        exact path until the first index is ready.
+        """
+        if faiss is None or np is None:
+            return False
+
+        with self._build_lock:
+            if not self._needs_build():
+                return self._index is not None
+
+            if self._index is None:
+                # Train and fill a fresh index before publishing it
+                _, sample = self._vectors_after(0, self.TRAIN_SIZE)
+                nlist = int(self._count ** 0.5)
+                quantizer = faiss.IndexFlatIP(self.dimension)
+                index = faiss.IndexIVFPQ(
+                    quantizer, self.dimension, nlist, self.PQ_SUBQUANTIZERS, self.PQ_BITS,
+                    faiss.METRIC_INNER_PRODUCT
+                )
+                index.train(sample)
+                index.nprobe = self.NPROBE
+                indexed_rowid = 0
+                while True:
+                    ids, vectors = self._vectors_after(indexed_rowid, self.ADD_BATCH)
+                    if not len(ids):
+                        break
+                    index.add_with_ids(vectors, ids)
+                    indexed_rowid = int(ids[-1])
+                with self._index_lock:
+                    self._index, self._quantizer = index, quantizer
+                    self._indexed_rowid = indexed_rowid
+                self._save_index()  # Expensive to redo, persist right away
+                return True
+
+            while True:
+                ids, vectors = self._vectors_after(self._indexed_rowid, self.ADD_BATCH)
+                if not len(ids):
+                    break
+                with self._index_lock:
+                    self._index.add_with_ids(vectors, ids)
+                    self._indexed_rowid = int(ids[-1])
+                self._dirty = True
+
+            if save or time.monotonic() - self._last_save >= self.SAVE_INTERVAL:
+                self._save_index()
+            return True
+
+    def _build_in_background(self) -> None:
+        """Start a background build_index() unless one is running or there is nothing to do."""
+        if faiss is None or np is None:
+            return
+        with self._index_lock:
+            if self._builder is not None and self._builder.is_alive():
+                return
+            if not self._needs_build():
+                return
+            # Saved at most every SAVE_INTERVAL here, and on close()
+            self._builder = threading.Thread(
+                target=self.build_index, kwargs={"save": False}, daemon=True
+            )
+            self._builder.start()
+
+    def close(self):
+        """Finish a running index build, persist the index, then close."""
+        builder = self._builder
+        if builder is not None:
+            builder.join()
+        self._save_if_dirty()
+        atexit.unregister(self._save_if_dirty)
+        super().close()
+
+    def search(
+        self,
+        query_embedding: List[float],
+        limit: int = 20,
+        filters: Optional[Dict[str, Any]] = None
+    ) -> List[Dict[str, Any]]:
+        """Search the FAISS index, or fall back to exact search for small stores."""
+        # Training and adding run off the request path; until the first
+        # index is ready, searches use the exact path
+        self._build_in_background()
+        if self._index is None:
+            return super().search(query_embedding, limit=limit, filters=filters)
+
+        query = np.asarray([query_embedding], dtype=np.float32)
+        query /= np.linalg.norm(query) or 1.0
+        with self._index_lock:
+            # Over-fetch candidates; they are re-scored exactly below, and
+            # entries of replaced rows drop out when resolving ids
+            _, ids = self._index.search(query, limit * self.RERANK_FACTOR)
+
+        candidates = [int(i) for i in ids[0] if i >= 0]
+        if not candidates:
+            return []
+
+        placeholders = ",".join("?" * len(candidates))
+        rows = self.conn.execute(
+            f"SELECT event_id, embedding FROM embeddings WHERE rowid IN ({placeholders})",
+            candidates
+        ).fetchall()
+        if not rows:
+            return []
+
+        # PQ distances are approximate: rank the candidates by exact cosine
+        scores = self._normalized_matrix([row[1] for row in rows]) @ query[0]
+        top = np.argsort(-scores)[:limit]
+        return self._with_metadata([(rows[i][0], float(scores[i])) for i in top])
@@ -5,9 +5,14 @@ Combines FTS5 keyword search with optional semantic search,
 using Reciprocal Rank Fusion (RRF) to merge results.
 """
 
+from collections import defaultdict
 from dataclasses import dataclass
+from functools import lru_cache
+from operator import itemgetter
 from typing import List, Optional, Tuple
 from pathlib import Path
+import heapq
+import json
 import time
 
 from .storage import SQLiteStorage
@@ -26,6 +31,109 @@ class SearchResult:
     cosine_similarity: float = 0.0  # Raw semantic similarity (0.0-1.0) for display
 
 
+@lru_cache(maxsize=None)
+def _keyword_sql(by_type: bool, by_date_from: bool, by_date_to: bool) -> str:
+    """Build the keyword search SQL for one combination of filters."""
+    if not (by_date_from or by_date_to):
+        # Rank and limit inside FTS5, then join only the top hits to events;
+        # a type filter narrows the candidates through idx_events_type
+        type_filter = (
+            " AND rowid IN (SELECT rowid_alias FROM events"
+            " WHERE type IN (SELECT value FROM json_each(?)))"
+            if by_type else ""
+        )
+        return f"""
+            WITH m AS (
+                SELECT rowid, bm25(events_fts) AS score
+                FROM events_fts
+                WHERE events_fts MATCH ?{type_filter}
+                ORDER BY score
+                LIMIT ?
+            )
+            SELECT e.id, e.session_id, e.type, e.ts, e.content, m.score
+            FROM m
+            JOIN events e ON e.rowid_alias = m.rowid
+            ORDER BY m.score
+        """
+
+    sql = """
+        SELECT
+            e.id,
+            e.session_id,
+            e.type,
+            e.ts,
+            e.content,
+            bm25(events_fts) as score
+        FROM events_fts
+        JOIN events e ON e.rowid_alias = events_fts.rowid
+        WHERE events_fts MATCH ?
+    """
+    if by_type:
+        # Types arrive as one JSON array, keeping the SQL independent of their count
+        sql += " AND e.type IN (SELECT value FROM json_each(?))"
+    if by_date_from:
+        sql += " AND e.ts >= ?"
+    if by_date_to:
+        sql += " AND e.ts <= ?"
+    return sql + " ORDER BY score LIMIT ?"
+
+
+@lru_cache(maxsize=None)
+def _hybrid_sql(by_type: bool, by_date_from: bool, by_date_to: bool) -> str:
+    """
+    Build the SQL that fuses keyword and semantic rankings with RRF.
+
+    The keyword ranking comes from the keyword search query; the semantic
+    ranking is bound as a JSON array of [event_id, cosine, session_id,
+    event_type, timestamp, content] rows. Ties keep keyword order first, then
+    semantic order. Keyword hits are read from events; semantic-only hits
+    keep the embedding metadata, so they survive even without an events row.
+    """
+    return f"""
+        WITH kw AS (
+            SELECT id AS event_id, ROW_NUMBER() OVER (ORDER BY score) AS rank
+            FROM ({_keyword_sql(by_type, by_date_from, by_date_to)})
+        ),
+        sem AS (
+            SELECT
+                json_extract(value, '$[0]') AS event_id,
+                key + 1 AS rank,
+                json_extract(value, '$[1]') AS cosine,
+                json_extract(value, '$[2]') AS session_id,
+                json_extract(value, '$[3]') AS type,
+                json_extract(value, '$[4]') AS ts,
+                json_extract(value, '$[5]') AS content
+            FROM json_each(?)
+        ),
+        fused AS (
+            SELECT
+                event_id,
+                SUM(1.0 / (? + rank)) AS score,
+                MAX(cosine) AS cosine,
+                MIN(ord) AS ord
+            FROM (
+                SELECT event_id, rank, NULL AS cosine, rank AS ord FROM kw
+                UNION ALL
+                SELECT event_id, rank, cosine, 1000000 + rank AS ord FROM sem
+            )
+            GROUP BY event_id
+        )
+        SELECT
+            f.event_id,
+            CASE WHEN e.id IS NULL THEN s.session_id ELSE e.session_id END,
+            CASE WHEN e.id IS NULL THEN s.type ELSE e.type END,
+            CASE WHEN e.id IS NULL THEN s.ts ELSE e.ts END,
+            CASE WHEN e.id IS NULL THEN s.content ELSE e.content END,
+            f.score,
+            f.cosine
+        FROM fused f
+        LEFT JOIN events e ON e.id = f.event_id AND f.ord < 1000000  -- keyword hits
+        LEFT JOIN sem s ON s.event_id = f.event_id
+        ORDER BY f.score DESC, f.ord
+        LIMIT ?
+    """
+
+
 class SearchService:
     """Hybrid search service combining keyword and semantic search."""
 
@@ -42,35 +150,16 @@ class SearchService:
         date_to: Optional[str] = None
     ) -> List[SearchResult]:
         """FTS5 keyword search with BM25 ranking."""
-        # Build query with filters
-        sql = """
-            SELECT
-                e.id,
-                e.session_id,
-                e.type,
-                e.ts,
-                e.content,
-                bm25(events_fts) as score
-            FROM events_fts
-            JOIN events e ON events_fts.event_id = e.id
-            WHERE events_fts MATCH ?
-        """
+        # Filters only pick between a handful of fixed SQL strings, so the
+        # connection's statement cache reuses the prepared query
+        sql = _keyword_sql(bool(event_types), bool(date_from), bool(date_to))
         params = [query]
-
         if event_types:
-            placeholders = ",".join("?" * len(event_types))
-            sql += f" AND e.type IN ({placeholders})"
-            params.extend(event_types)
-
+            params.append(json.dumps(event_types))
         if date_from:
-            sql += " AND e.ts >= ?"
             params.append(date_from)
-
         if date_to:
-            sql += " AND e.ts <= ?"
             params.append(date_to)
-
-        sql += " ORDER BY score LIMIT ?"
         params.append(limit)
 
         cursor = self.sqlite.conn.execute(sql, params)
@@ -99,11 +188,14 @@ class SearchService:
         Semantic search using embeddings.
         Falls back to empty results if embeddings not available.
         """
-        if self.embeddings is None:
+        if self.embeddings is None or not query.strip():
             return []
 
-        # Get query embedding
-        query_embedding = self.embeddings.encode([query])[0]
+        # Get query embedding (None if encoding failed)
+        encoded = self.embeddings.encode([query])
+        if encoded is None or not len(encoded):
+            return []
+        query_embedding = encoded[0]
 
         # Search similar embeddings
         # This would use sqlite-vec in production
@@ -131,7 +223,8 @@ class SearchService:
         self,
         keyword_results: List[SearchResult],
         semantic_results: List[SearchResult],
-        k: int = 60
+        k: int = 60,
+        limit: Optional[int] = None
     ) -> List[SearchResult]:
         """
         Combine results using Reciprocal Rank Fusion.
@@ -142,38 +235,42 @@ class SearchService:
         different score distributions from different search methods.
 
         Preserves cosine_similarity from semantic results for display purposes.
+        Returns only the top `limit` results when given.
         """
-        scores = {}
+        scores = defaultdict(float)
         result_map = {}
         cosine_scores = {}  # Preserve cosine similarity from semantic search
 
+        # 1/(k + rank) for every rank either list can reach
+        rrf = [1 / (k + rank) for rank in range(1, max(len(keyword_results), len(semantic_results)) + 1)]
+
         # Score from keyword results
         for rank, result in enumerate(keyword_results):
-            rrf_score = 1 / (k + rank + 1)
-            scores[result.event_id] = scores.get(result.event_id, 0) + rrf_score
+            scores[result.event_id] += rrf[rank]
             result_map[result.event_id] = result
 
         # Score from semantic results
         for rank, result in enumerate(semantic_results):
-            rrf_score = 1 / (k + rank + 1)
-            scores[result.event_id] = scores.get(result.event_id, 0) + rrf_score
+            scores[result.event_id] += rrf[rank]
             # Preserve cosine similarity from semantic results
             cosine_scores[result.event_id] = result.cosine_similarity
-            if result.event_id not in result_map:
-                result_map[result.event_id] = result
+            result_map.setdefault(result.event_id, result)
 
-        # Sort by combined RRF score
-        sorted_ids = sorted(scores.keys(), key=lambda x: -scores[x])
+        # Rank by combined RRF score
+        if limit is None:
+            ranked = sorted(scores.items(), key=itemgetter(1), reverse=True)
+        else:
+            ranked = heapq.nlargest(limit, scores.items(), key=itemgetter(1))
 
         results = []
-        for event_id in sorted_ids:
+        for event_id, score in ranked:
             result = result_map[event_id]
             results.append(SearchResult(
                 event_id=result.event_id,
                 session_id=result.session_id,
                 event_type=result.event_type,
                 content=result.content,
-                score=scores[event_id],
+                score=score,
                 timestamp=result.timestamp,
                 source="hybrid",
                 cosine_similarity=cosine_scores.get(event_id, 0.0)
@@ -188,52 +285,88 @@ class SearchService:
         event_types: Optional[List[str]] = None,
         date_from: Optional[str] = None,
         date_to: Optional[str] = None,
-        use_semantic: bool = True
+        use_semantic: bool = True,
+        k: int = 60
     ) -> Tuple[List[SearchResult], float]:
         """
         Perform hybrid search combining keyword and semantic results.
         Returns (results, time_ms).
+
+        Fusion uses the same RRF scoring as reciprocal_rank_fusion(), but runs
+        inside SQLite so candidates that don't make the cut are never built.
         """
         start_time = time.perf_counter()
 
-        # Get keyword results
-        keyword_results = self.keyword_search(
-            query,
-            limit=limit * 2,  # Get more for fusion
-            event_types=event_types,
-            date_from=date_from,
-            date_to=date_to
-        )
-
-        # Get semantic results if enabled and available
-        semantic_results = []
-        if use_semantic and self.embeddings is not None:
-            semantic_results = self.semantic_search(
+        # Get semantic ranking if enabled and available
+        semantic_ranking = []
+        encoded = None
+        if use_semantic and self.embeddings is not None and query.strip():
+            # None when encoding failed: fall back to keyword results
+            encoded = self.embeddings.encode([query])
+        if encoded is not None and len(encoded):
+            query_embedding = encoded[0]
+            semantic_ranking = [
+                (r["event_id"], r["score"], r["session_id"], r["event_type"], r["timestamp"], r["content"])
+                for r in self.embeddings.search(
+                    query_embedding,
+                    limit=limit * 2,  # Get more for fusion
+                    filters={"event_types": event_types} if event_types else None
+                )
+            ]
+
+        if not semantic_ranking:
+            results = self.keyword_search(
                 query,
-                limit=limit * 2,
-                event_types=event_types
+                limit=limit,
+                event_types=event_types,
+                date_from=date_from,
+                date_to=date_to
             )
+            return results, (time.perf_counter() - start_time) * 1000
+
+        # Fuse both rankings in SQLite; only the final top results become objects
+        params = [query]
+        if event_types:
+            params.append(json.dumps(event_types))
+        if date_from:
+            params.append(date_from)
+        if date_to:
+            params.append(date_to)
+        params += [limit * 2, json.dumps(semantic_ranking), k, limit]
 
-        # Fuse results
-        if semantic_results:
-            results = self.reciprocal_rank_fusion(
-                keyword_results, semantic_results
+        cursor = self.sqlite.conn.execute(
+            _hybrid_sql(bool(event_types), bool(date_from), bool(date_to)), params
+        )
+        results = [
+            SearchResult(
+                event_id=row[0],
+                session_id=row[1],
+                event_type=row[2],
+                timestamp=row[3],
+                content=row[4] or "",
+                score=row[5],
+                source="hybrid",
+                cosine_similarity=row[6] or 0.0
             )
-        else:
-            results = keyword_results
+            for row in cursor
+        ]
 
         elapsed_ms = (time.perf_counter() - start_time) * 1000
 
-        return results[:limit], elapsed_ms
+        return results, elapsed_ms
 
     def get_suggestions(self, prefix: str, limit: int = 10) -> List[str]:
         """Get search suggestions based on prefix."""
-        # Simple implementation: find matching content prefixes
+        if not prefix.strip():
+            return []
+
+        # Prefix query against the FTS index (quoted so the input is taken literally)
+        match = 'content : "' + prefix.replace('"', '""') + '"*'
         cursor = self.sqlite.conn.execute("""
-            SELECT DISTINCT content
-            FROM events
-            WHERE content LIKE ? || '%'
+            SELECT DISTINCT snippet(events_fts, 0, '', '', '', 32)
+            FROM events_fts
+            WHERE events_fts MATCH ?
             LIMIT ?
-        """, (prefix, limit))
+        """, (match, limit))
 
         return [row[0] for row in cursor if row[0]]
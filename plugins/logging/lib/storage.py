@@ -7,10 +7,47 @@ Provides both JSONL (source of truth) and SQLite (indexed search) storage.
 import sqlite3
 import json
 import fcntl
+import os
+import sys
+import threading
 from pathlib import Path
 from datetime import datetime, timezone
 from typing import Optional, Iterator, List
-from dataclasses import dataclass, asdict
+from dataclasses import dataclass, asdict, is_dataclass
+
+try:
+    import orjson
+    _loads = orjson.loads
+
+    def _dumps(obj) -> str:
+        """Serialize to a JSON string (orjson fast path)."""
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode()
+        except TypeError:
+            # Values orjson rejects (e.g. integers wider than 64 bits)
+            return json.dumps(obj)
+
+    def _dumps_line(obj) -> bytes:
+        """Serialize a record (dict or dataclass) to one JSONL line (orjson fast path)."""
+        try:
+            # orjson serializes dataclasses natively, no asdict() copy
+            return orjson.dumps(obj, option=orjson.OPT_APPEND_NEWLINE | orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            return _json_line(obj)
+except ImportError:
+    _loads = json.loads
+    _dumps = json.dumps
+
+    def _dumps_line(obj) -> bytes:
+        """Serialize a record (dict or dataclass) to one JSONL line (stdlib fallback)."""
+        return _json_line(obj)
+
+
+def _json_line(obj) -> bytes:
+    """Serialize a record to one JSONL line with the stdlib encoder."""
+    if is_dataclass(obj):
+        obj = asdict(obj)
+    return (json.dumps(obj, ensure_ascii=False) + "\n").encode("utf-8")
 
 
 @dataclass
@@ -47,28 +84,82 @@ class Event:
             self.data = {}
 
 
+def fold_image_patches(events: List[dict]) -> List[dict]:
+    """
+    Apply ImagesPatch records to their target events and drop the patches.
+
+    The logging hook attaches transcript images to earlier UserPromptSubmit
+    events by appending an ImagesPatch record instead of rewriting the file.
+    """
+    patches = {}
+    folded = []
+    for event in events:
+        if event.get("type") == "ImagesPatch":
+            patches.setdefault(event.get("target_event_id"), event.get("images", []))
+        else:
+            folded.append(event)
+
+    if patches:
+        for event in folded:
+            if event.get("id") in patches and "images" not in event:
+                event["images"] = patches[event["id"]]
+
+    return folded
+
+
 class JSONLStorage:
     """Append-only JSONL storage (source of truth)."""
 
-    def __init__(self, base_path: Path):
+    def __init__(self, base_path: Path, use_flock: bool = not sys.platform.startswith("linux")):
         self.base_path = base_path
         self.sessions_dir = base_path / "sessions"
         self.sessions_dir.mkdir(parents=True, exist_ok=True)
+        # One write() on an O_APPEND descriptor is appended atomically on
+        # Linux; elsewhere each write also takes an flock
+        self.use_flock = use_flock
+        self._handles: dict = {}  # session_id -> O_APPEND fd, kept open
+        self._handles_lock = threading.Lock()
 
     def get_session_path(self, session_id: str) -> Path:
         """Get path to session JSONL file."""
         return self.sessions_dir / f"{session_id}.jsonl"
 
+    def _handle(self, session_id: str) -> int:
+        """Return the session's append descriptor, opening it on first use."""
+        fd = self._handles.get(session_id)
+        if fd is None:
+            with self._handles_lock:
+                fd = self._handles.get(session_id)
+                if fd is None:
+                    fd = os.open(
+                        self.get_session_path(session_id),
+                        os.O_WRONLY | os.O_APPEND | os.O_CREAT | os.O_CLOEXEC,
+                        0o644,
+                    )
+                    self._handles[session_id] = fd
+        return fd
+
     def append_event(self, event: Event) -> None:
-        """Append event to session JSONL file with locking."""
-        path = self.get_session_path(event.session_id)
+        """Append event to session JSONL file with a single atomic write."""
+        fd = self._handle(event.session_id)
+        line = _dumps_line(event)
+
+        if not self.use_flock:
+            os.write(fd, line)
+            return
+
+        fcntl.flock(fd, fcntl.LOCK_EX)
+        try:
+            os.write(fd, line)
+        finally:
+            fcntl.flock(fd, fcntl.LOCK_UN)
 
-        with open(path, "a") as f:
-            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
-            try:
-                f.write(json.dumps(asdict(event), ensure_ascii=False) + "\n")
-            finally:
-                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+    def close(self) -> None:
+        """Close the append descriptors kept open by append_event()."""
+        with self._handles_lock:
+            for fd in self._handles.values():
+                os.close(fd)
+            self._handles.clear()
 
     def read_session(self, session_id: str) -> Iterator[dict]:
         """Read all events for a session."""
@@ -76,10 +167,10 @@ class JSONLStorage:
         if not path.exists():
             return
 
-        with open(path, "r") as f:
-            for line in f:
-                if line.strip():
-                    yield json.loads(line)
+        # One read, then split in C rather than iterating the file line by line
+        events = [_loads(line) for line in path.read_bytes().splitlines() if line.strip()]
+
+        yield from fold_image_patches(events)
 
     def list_sessions(self) -> List[str]:
         """List all session IDs."""
@@ -99,12 +190,42 @@ class SQLiteStorage:
     def __init__(self, db_path: Path):
         self.db_path = db_path
         self.db_path.parent.mkdir(parents=True, exist_ok=True)
-        self.conn = sqlite3.connect(str(db_path))
+        # Shared with the API server's worker threads
+        self.conn = sqlite3.connect(str(db_path), check_same_thread=False, cached_statements=256)
         self.conn.row_factory = sqlite3.Row
+        self._configure()
         self._init_schema()
 
+    def _configure(self):
+        """Tune the connection for a read-heavy workload with a single writer."""
+        # WAL lets API reads proceed while a sync is writing
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("PRAGMA temp_store=MEMORY")
+        self.conn.execute("PRAGMA cache_size=-65536")  # 64 MiB
+        self.conn.execute("PRAGMA mmap_size=268435456")  # 256 MiB
+        # Wait for a concurrent writer (hook sync, repair tool) instead of failing
+        self.conn.execute("PRAGMA busy_timeout=5000")
+
     def _init_schema(self):
         """Initialize database schema."""
+        # events_fts points at events by rowid, so events needs an explicit
+        # INTEGER PRIMARY KEY: VACUUM may renumber an implicit rowid. Older
+        # databases get the column added (keeping current rowids) and the
+        # index rebuilt; databases whose events_fts still holds its own copy
+        # of the text are rebuilt the same way
+        events_sql = self._schema_sql("events")
+        rebuild_fts = events_sql is not None and "rowid_alias" not in events_sql
+        if rebuild_fts:
+            self._add_events_rowid_alias()  # Also drops events_fts
+        fts_sql = self._schema_sql("events_fts")
+        if fts_sql is not None and "content_rowid='rowid_alias'" not in fts_sql:
+            self.conn.execute("DROP TABLE events_fts")
+            rebuild_fts = True
+        fill_type_counts = self.conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'session_type_counts'"
+        ).fetchone() is None
+
         self.conn.executescript("""
             -- Sessions table
             CREATE TABLE IF NOT EXISTS sessions (
@@ -124,7 +245,8 @@ class SQLiteStorage:
 
             -- Events table
             CREATE TABLE IF NOT EXISTS events (
-                id TEXT PRIMARY KEY,
+                rowid_alias INTEGER PRIMARY KEY,  -- stable rowid for events_fts
+                id TEXT NOT NULL UNIQUE,
                 session_id TEXT NOT NULL,
                 type TEXT NOT NULL,
                 ts TIMESTAMP NOT NULL,
@@ -140,18 +262,70 @@ class SQLiteStorage:
             CREATE INDEX IF NOT EXISTS idx_events_type
             ON events(type);
 
-            CREATE INDEX IF NOT EXISTS idx_events_ts
-            ON events(ts DESC);
+            CREATE INDEX IF NOT EXISTS idx_events_session_type
+            ON events(session_id, type);
+
+            -- Recent-events listing: ORDER BY ts DESC with an optional type filter
+            DROP INDEX IF EXISTS idx_events_ts;
+            CREATE INDEX IF NOT EXISTS idx_events_ts_type
+            ON events(ts DESC, type);
 
-            -- FTS5 for full-text search
+            -- FTS5 over events.content: external content, so the text is
+            -- stored once and the triggers below keep the index in sync
             CREATE VIRTUAL TABLE IF NOT EXISTS events_fts USING fts5(
-                event_id,
-                session_id,
-                type,
                 content,
-                tokenize='porter'
+                content='events',
+                content_rowid='rowid_alias',
+                tokenize='porter unicode61 remove_diacritics 2',
+                prefix='2 3 4'  -- prefix indexes for suggestion lookups
             );
 
+            CREATE TRIGGER IF NOT EXISTS events_fts_ai AFTER INSERT ON events BEGIN
+                INSERT INTO events_fts(rowid, content) VALUES (new.rowid_alias, new.content);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS events_fts_ad AFTER DELETE ON events BEGIN
+                INSERT INTO events_fts(events_fts, rowid, content)
+                VALUES ('delete', old.rowid_alias, old.content);
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS events_fts_au AFTER UPDATE ON events BEGIN
+                INSERT INTO events_fts(events_fts, rowid, content)
+                VALUES ('delete', old.rowid_alias, old.content);
+                INSERT INTO events_fts(rowid, content) VALUES (new.rowid_alias, new.content);
+            END;
+
+            -- Per-session event counts by type, kept current by triggers so
+            -- dashboards read a few rows instead of grouping all events
+            CREATE TABLE IF NOT EXISTS session_type_counts (
+                session_id TEXT NOT NULL,
+                type TEXT NOT NULL,
+                count INTEGER NOT NULL,
+                PRIMARY KEY (session_id, type)
+            ) WITHOUT ROWID;
+
+            CREATE TRIGGER IF NOT EXISTS session_type_counts_ai AFTER INSERT ON events BEGIN
+                INSERT INTO session_type_counts VALUES (new.session_id, new.type, 1)
+                ON CONFLICT(session_id, type) DO UPDATE SET count = count + 1;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS session_type_counts_ad AFTER DELETE ON events BEGIN
+                UPDATE session_type_counts SET count = count - 1
+                WHERE session_id = old.session_id AND type = old.type;
+                DELETE FROM session_type_counts
+                WHERE session_id = old.session_id AND type = old.type AND count <= 0;
+            END;
+
+            CREATE TRIGGER IF NOT EXISTS session_type_counts_au AFTER UPDATE OF session_id, type ON events
+            WHEN old.session_id IS NOT new.session_id OR old.type IS NOT new.type BEGIN
+                UPDATE session_type_counts SET count = count - 1
+                WHERE session_id = old.session_id AND type = old.type;
+                DELETE FROM session_type_counts
+                WHERE session_id = old.session_id AND type = old.type AND count <= 0;
+                INSERT INTO session_type_counts VALUES (new.session_id, new.type, 1)
+                ON CONFLICT(session_id, type) DO UPDATE SET count = count + 1;
+            END;
+
             -- Sync state for JSONL → SQLite
             CREATE TABLE IF NOT EXISTS sync_state (
                 session_id TEXT PRIMARY KEY,
@@ -169,10 +343,57 @@ class SQLiteStorage:
                 tags JSON DEFAULT '[]'
             );
         """)
+        if rebuild_fts:
+            self.conn.execute("INSERT INTO events_fts(events_fts) VALUES ('rebuild')")
+        if fill_type_counts:
+            self.conn.execute("""
+                INSERT INTO session_type_counts (session_id, type, count)
+                SELECT session_id, type, COUNT(*) FROM events GROUP BY session_id, type
+            """)
         self.conn.commit()
 
+    def _schema_sql(self, name: str) -> Optional[str]:
+        """CREATE statement of a table, or None if it doesn't exist."""
+        row = self.conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = ?", (name,)
+        ).fetchone()
+        return row[0] if row else None
+
+    def _add_events_rowid_alias(self) -> None:
+        """Rebuild events with a rowid_alias INTEGER PRIMARY KEY, keeping rowids."""
+        # Triggers and indexes on events are recreated by _init_schema
+        self.conn.executescript("""
+            BEGIN;
+            DROP TRIGGER IF EXISTS events_fts_ai;
+            DROP TRIGGER IF EXISTS events_fts_ad;
+            DROP TRIGGER IF EXISTS events_fts_au;
+            DROP TRIGGER IF EXISTS session_type_counts_ai;
+            DROP TRIGGER IF EXISTS session_type_counts_ad;
+            DROP TRIGGER IF EXISTS session_type_counts_au;
+            DROP TABLE IF EXISTS events_fts;
+
+            CREATE TABLE events_new (
+                rowid_alias INTEGER PRIMARY KEY,  -- stable rowid for events_fts
+                id TEXT NOT NULL UNIQUE,
+                session_id TEXT NOT NULL,
+                type TEXT NOT NULL,
+                ts TIMESTAMP NOT NULL,
+                agent_session_num INTEGER DEFAULT 0,
+                data JSON NOT NULL,
+                content TEXT,
+                FOREIGN KEY (session_id) REFERENCES sessions(id)
+            );
+            INSERT INTO events_new
+                (rowid_alias, id, session_id, type, ts, agent_session_num, data, content)
+            SELECT rowid, id, session_id, type, ts, agent_session_num, data, content
+            FROM events;
+            DROP TABLE events;
+            ALTER TABLE events_new RENAME TO events;
+            COMMIT;
+        """)
+
     def insert_session(self, session: Session) -> None:
-        """Insert or update a session."""
+        """Insert or update a session (committed by flush())."""
         self.conn.execute("""
             INSERT OR REPLACE INTO sessions
             (id, started_at, ended_at, cwd, summary, tags, event_count, total_tokens)
@@ -183,54 +404,73 @@ class SQLiteStorage:
             session.ended_at,
             session.cwd,
             session.summary,
-            json.dumps(session.tags),
+            _dumps(session.tags),
             session.event_count,
             session.total_tokens,
         ))
-        self.conn.commit()
 
     def insert_event(self, event: Event) -> None:
-        """Insert event and update FTS index."""
-        # Insert event
-        self.conn.execute("""
-            INSERT OR REPLACE INTO events
+        """Insert event and update FTS index (committed by flush())."""
+        self.insert_events_bulk([event])
+
+    def insert_events_bulk(self, events: List[Event]) -> None:
+        """
+        Insert events with one executemany; triggers maintain the FTS index.
+
+        Nothing is committed here: callers batch as much as they like into
+        the open transaction and call flush() once.
+        """
+        # Upsert rather than INSERT OR REPLACE: the row keeps its rowid and
+        # fires the UPDATE trigger (REPLACE's implicit delete fires no trigger)
+        self.conn.executemany("""
+            INSERT INTO events
             (id, session_id, type, ts, agent_session_num, data, content)
             VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (
-            event.id,
-            event.session_id,
-            event.type,
-            event.ts,
-            event.agent_session_num,
-            json.dumps(event.data),
-            event.content,
-        ))
-
-        # Insert into FTS if there's content
-        if event.content:
-            self.conn.execute("""
-                INSERT OR REPLACE INTO events_fts
-                (event_id, session_id, type, content)
-                VALUES (?, ?, ?, ?)
-            """, (event.id, event.session_id, event.type, event.content))
-
+            ON CONFLICT(id) DO UPDATE SET
+                session_id = excluded.session_id,
+                type = excluded.type,
+                ts = excluded.ts,
+                agent_session_num = excluded.agent_session_num,
+                data = excluded.data,
+                content = excluded.content
+        """, [
+            (
+                event.id,
+                event.session_id,
+                event.type,
+                event.ts,
+                event.agent_session_num,
+                _dumps(event.data),
+                event.content,
+            )
+            for event in events
+        ])
+
+    def flush(self) -> None:
+        """Commit pending inserts and sync-state updates."""
         self.conn.commit()
 
     def search(self, query: str, limit: int = 20) -> List[dict]:
         """Full-text search across events."""
+        # Rank and limit inside FTS5 first, then join only the top hits
         cursor = self.conn.execute("""
+            WITH m AS (
+                SELECT rowid, bm25(events_fts) AS score
+                FROM events_fts
+                WHERE events_fts MATCH ?
+                ORDER BY score
+                LIMIT ?
+            )
             SELECT
                 e.id,
                 e.session_id,
                 e.type,
                 e.ts,
                 e.content,
-                bm25(events_fts) as score
-            FROM events_fts
-            JOIN events e ON events_fts.event_id = e.id
-            WHERE events_fts MATCH ?
-            ORDER BY score
-            LIMIT ?
+                m.score
+            FROM m
+            JOIN events e ON e.rowid_alias = m.rowid
+            ORDER BY m.score
         """, (query, limit))
 
         return [dict(row) for row in cursor]
@@ -244,14 +484,14 @@ class SQLiteStorage:
         row = cursor.fetchone()
         return dict(row) if row else None
 
-    def list_sessions(
+    def _sessions_page_query(
         self,
-        limit: int = 50,
-        offset: int = 0,
-        date_from: Optional[str] = None,
-        date_to: Optional[str] = None
-    ) -> List[dict]:
-        """List sessions with pagination and optional filtering."""
+        limit: int,
+        offset: int,
+        date_from: Optional[str],
+        date_to: Optional[str]
+    ) -> tuple:
+        """Build the paginated, date-filtered sessions SELECT. Returns (sql, params)."""
         sql = "SELECT * FROM sessions"
         params = []
 
@@ -269,16 +509,62 @@ class SQLiteStorage:
         sql += " ORDER BY started_at DESC LIMIT ? OFFSET ?"
         params.extend([limit, offset])
 
+        return sql, params
+
+    def list_sessions(
+        self,
+        limit: int = 50,
+        offset: int = 0,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None
+    ) -> List[dict]:
+        """List sessions with pagination and optional filtering."""
+        sql, params = self._sessions_page_query(limit, offset, date_from, date_to)
+
         cursor = self.conn.execute(sql, params)
         return [dict(row) for row in cursor]
 
+    def list_sessions_with_type_counts(
+        self,
+        limit: int = 50,
+        offset: int = 0,
+        date_from: Optional[str] = None,
+        date_to: Optional[str] = None
+    ) -> List[dict]:
+        """
+        List sessions like list_sessions(), each with an event_type_counts dict.
+
+        One query: the page of sessions joined to the trigger-maintained
+        session_type_counts, so no events are scanned.
+        """
+        sql, params = self._sessions_page_query(limit, offset, date_from, date_to)
+
+        cursor = self.conn.execute(f"""
+            WITH s AS ({sql})
+            SELECT s.*, c.type AS _event_type, c.count AS _event_type_count
+            FROM s
+            LEFT JOIN session_type_counts c ON c.session_id = s.id
+            ORDER BY s.started_at DESC, s.id
+        """, params)
+
+        sessions = {}
+        for row in cursor:
+            session = sessions.get(row["id"])
+            if session is None:
+                session = dict(row)
+                del session["_event_type"], session["_event_type_count"]
+                session["event_type_counts"] = {}
+                sessions[row["id"]] = session
+            if row["_event_type"] is not None:
+                session["event_type_counts"][row["_event_type"]] = row["_event_type_count"]
+        return list(sessions.values())
+
     def get_event_type_counts(self, session_id: str) -> dict:
         """Get event counts by type for a session."""
         cursor = self.conn.execute("""
-            SELECT type, COUNT(*) as count
-            FROM events
+            SELECT type, count
+            FROM session_type_counts
             WHERE session_id = ?
-            GROUP BY type
         """, (session_id,))
         return {row[0]: row[1] for row in cursor}
 
@@ -287,13 +573,12 @@ class SQLiteStorage:
         if not session_ids:
             return {}
 
-        placeholders = ",".join("?" * len(session_ids))
-        cursor = self.conn.execute(f"""
-            SELECT session_id, type, COUNT(*) as count
-            FROM events
-            WHERE session_id IN ({placeholders})
-            GROUP BY session_id, type
-        """, session_ids)
+        # IDs arrive as one JSON array, so any number fits in a single parameter
+        cursor = self.conn.execute("""
+            SELECT session_id, type, count
+            FROM session_type_counts
+            WHERE session_id IN (SELECT value FROM json_each(?))
+        """, (_dumps(session_ids),))
 
         result = {}
         for row in cursor:
@@ -327,12 +612,11 @@ class SQLiteStorage:
         return row[0] if row else 0
 
     def update_sync_position(self, session_id: str, position: int) -> None:
-        """Update sync position for a session."""
+        """Update sync position for a session (committed by flush())."""
         self.conn.execute("""
             INSERT OR REPLACE INTO sync_state (session_id, last_position, last_sync)
             VALUES (?, ?, ?)
         """, (session_id, position, datetime.now(timezone.utc).isoformat()))
-        self.conn.commit()
 
     def close(self):
         """Close database connection."""
@@ -346,9 +630,14 @@ class StorageManager:
         self.base_path = base_path
         self.jsonl = JSONLStorage(base_path)
         self.sqlite = SQLiteStorage(base_path / "db" / "logging.db")
+        self._sync_lock = threading.Lock()
 
     def sync_session(self, session_id: str) -> int:
         """Sync a session from JSONL to SQLite. Returns events synced."""
+        with self._sync_lock:
+            return self._sync_session(session_id)
+
+    def _sync_session(self, session_id: str) -> int:
         last_pos = self.sqlite.get_sync_position(session_id)
         current_pos = self.jsonl.get_last_position(session_id)
 
@@ -356,30 +645,34 @@ class StorageManager:
             return 0
 
         # Read new events
-        events_synced = 0
+        events = []
         first_event_data = None
         path = self.jsonl.get_session_path(session_id)
 
-        with open(path, "r") as f:
+        with open(path, "rb") as f:
             f.seek(last_pos)
             for line in f:
                 if line.strip():
-                    data = json.loads(line)
-                    event = Event(**data)
-                    self.sqlite.insert_event(event)
-                    events_synced += 1
+                    data = _loads(line)
+                    if data.get("type") == "ImagesPatch":
+                        continue  # Folded into its target by read_session
+                    events.append(Event(**data))
 
                     # Capture first event for session metadata
                     if first_event_data is None:
                         first_event_data = data
 
-        # Update sync position
-        self.sqlite.update_sync_position(session_id, current_pos)
-
-        # Update session record with aggregated stats
-        self._update_session_from_events(session_id, first_event_data)
+        # Events, sync position and session stats land in one transaction
+        try:
+            self.sqlite.insert_events_bulk(events)
+            self.sqlite.update_sync_position(session_id, current_pos)
+            self._update_session_from_events(session_id, first_event_data)
+            self.sqlite.flush()
+        except BaseException:
+            self.sqlite.conn.rollback()
+            raise
 
-        return events_synced
+        return len(events)
 
     def _update_session_from_events(self, session_id: str, first_event_data: Optional[dict] = None) -> None:
         """Create or update session record from events table."""
@@ -412,7 +705,7 @@ class StorageManager:
             data_row = cursor.fetchone()
             if data_row and data_row[0]:
                 try:
-                    event_data = json.loads(data_row[0])
+                    event_data = _loads(data_row[0])
                     cwd = event_data.get('cwd')
                 except:
                     pass
@@ -439,4 +732,5 @@ class StorageManager:
 
     def close(self):
         """Close all connections."""
+        self.jsonl.close()
         self.sqlite.close()
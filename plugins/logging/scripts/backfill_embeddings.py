@@ -13,7 +13,7 @@ from pathlib import Path
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
 import sqlite3
-from lib.embeddings import EmbeddingService, EmbeddingStorage
+from lib.embeddings import EmbeddingService, FaissEmbeddingStorage
 import os
 
 
@@ -54,28 +54,38 @@ def backfill_embeddings(batch_size: int = 100, dry_run: bool = False):
         return 1
 
     events_conn = sqlite3.connect(str(events_db))
-    embedding_storage = EmbeddingStorage(storage_path / "embeddings.db")
-
-    # Get set of event IDs that already have embeddings
-    existing_embeddings = set()
-    try:
-        cursor = embedding_storage.conn.execute("SELECT event_id FROM embedding_metadata")
-        existing_embeddings = {row[0] for row in cursor}
-    except Exception:
-        pass  # Table might not exist yet
+    events_conn.executescript("""
+        PRAGMA journal_mode=WAL;
+        PRAGMA synchronous=NORMAL;
+        PRAGMA temp_store=MEMORY;
+        PRAGMA mmap_size=268435456;
+        PRAGMA cache_size=-65536;
+        PRAGMA busy_timeout=5000;
+    """)
+    # Embeddings can always be regenerated, so skip fsyncs while backfilling
+    embedding_storage = FaissEmbeddingStorage(storage_path / "embeddings.db", durable=False)
+
+    # Diff against the embeddings database inside SQLite, so neither ID set
+    # is materialized in Python and the encoder starts on the first rows
+    events_conn.execute("ATTACH DATABASE ? AS emb", (str(storage_path / "embeddings.db"),))
+    has_content = "content IS NOT NULL AND content != ''"
+    not_embedded = "id NOT IN (SELECT event_id FROM emb.embedding_metadata)"
 
     # Count total events with content
-    cursor = events_conn.execute("SELECT COUNT(*) FROM events WHERE content IS NOT NULL AND content != ''")
+    cursor = events_conn.execute(f"SELECT COUNT(*) FROM events WHERE {has_content}")
     total_count = cursor.fetchone()[0]
 
+    cursor = events_conn.execute("SELECT COUNT(*) FROM emb.embedding_metadata")
+    existing_count = cursor.fetchone()[0]
+
     # Get count of events that need embeddings
-    cursor = events_conn.execute("SELECT id FROM events WHERE content IS NOT NULL AND content != ''")
-    all_event_ids = {row[0] for row in cursor}
-    missing_ids = all_event_ids - existing_embeddings
-    missing_count = len(missing_ids)
+    cursor = events_conn.execute(
+        f"SELECT COUNT(*) FROM events WHERE {has_content} AND {not_embedded}"
+    )
+    missing_count = cursor.fetchone()[0]
 
     print(f"\nEvents with content: {total_count}")
-    print(f"Already have embeddings: {len(existing_embeddings)}")
+    print(f"Already have embeddings: {existing_count}")
     print(f"Missing embeddings: {missing_count}")
 
     if dry_run:
@@ -94,27 +104,22 @@ def backfill_embeddings(batch_size: int = 100, dry_run: bool = False):
     print(f"\nProcessing {missing_count} events in batches of {batch_size}...")
 
     processed = 0
-    missing_ids_list = list(missing_ids)
-
-    while processed < missing_count:
-        # Get batch of event IDs to process
-        batch_ids = missing_ids_list[processed:processed + batch_size]
-        if not batch_ids:
-            break
-
-        # Fetch event details for this batch
-        placeholders = ",".join("?" * len(batch_ids))
-        cursor = events_conn.execute(f"""
+    last_id = ""
+    while True:
+        # Keyset paging: each batch is its own short read, so no snapshot of
+        # embeddings.db stays open and its WAL can reset while we write
+        batch = events_conn.execute(f"""
             SELECT id, session_id, type, content, ts
             FROM events
-            WHERE id IN ({placeholders})
-            AND content IS NOT NULL
-            AND content != ''
-        """, batch_ids)
-
-        batch = cursor.fetchall()
+            WHERE {has_content}
+            AND {not_embedded}
+            AND id > ?
+            ORDER BY id
+            LIMIT ?
+        """, (last_id, batch_size)).fetchall()
         if not batch:
             break
+        last_id = batch[-1][0]
 
         # Extract texts for batch embedding
         texts = [row[3] for row in batch]
@@ -126,19 +131,20 @@ def backfill_embeddings(batch_size: int = 100, dry_run: bool = False):
             print(f"\nERROR generating embeddings: {e}")
             break
 
-        # Store embeddings
-        for i, (event_id, session_id, event_type, content, timestamp) in enumerate(batch):
-            if i < len(embeddings):
-                embedding_storage.store(
-                    event_id=event_id,
-                    embedding=embeddings[i],
-                    metadata={
-                        "session_id": session_id,
-                        "event_type": event_type,
-                        "content": content[:1000],  # Store first 1000 chars for search display
-                        "timestamp": timestamp,
-                    }
-                )
+        # Store embeddings (one executemany per table for the whole batch)
+        embedding_storage.store_many([
+            (
+                event_id,
+                embedding,
+                {
+                    "session_id": session_id,
+                    "event_type": event_type,
+                    "content": content[:1000],  # Store first 1000 chars for search display
+                    "timestamp": timestamp,
+                }
+            )
+            for (event_id, session_id, event_type, content, timestamp), embedding in zip(batch, embeddings)
+        ])
 
         processed += len(batch)
 
@@ -148,6 +154,10 @@ def backfill_embeddings(batch_size: int = 100, dry_run: bool = False):
 
     print(f"\n✓ Generated {processed} embeddings")
 
+    # Train or extend the FAISS index here instead of in the API's first search
+    if embedding_storage.build_index():
+        print("✓ FAISS index updated")
+
     # Verify final count
     cursor = embedding_storage.conn.execute("SELECT COUNT(*) FROM embeddings")
     final_count = cursor.fetchone()[0]
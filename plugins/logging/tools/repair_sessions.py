@@ -14,33 +14,71 @@ Usage:
 
 import argparse
 import json
+import os
 import sys
+from functools import lru_cache
 from pathlib import Path
 from datetime import datetime, timezone
 
+try:
+    import orjson
+    _loads = orjson.loads
+except ImportError:
+    _loads = json.loads
 
-def get_response(transcript_path: str) -> str:
+
+def get_response(transcript_path: str, tail_bytes: int = 1 << 20) -> str:
     """Extract last assistant response from Claude's transcript."""
+    # Stop events of one conversation share a transcript; key the cache on
+    # mtime and size so a transcript that grew is read again
+    try:
+        st = os.stat(transcript_path)
+    except OSError:
+        return ""
+    return _last_response(transcript_path, st.st_mtime_ns, st.st_size, tail_bytes)
+
+
+@lru_cache(maxsize=256)
+def _last_response(transcript_path: str, mtime_ns: int, size: int, tail_bytes: int) -> str:
+    """Scan a transcript backwards for its last assistant text (cached per version)."""
     try:
-        for line in reversed(Path(transcript_path).read_text().strip().split("\n")):
-            if line.strip():
-                entry = json.loads(line)
-                if entry.get("type") == "assistant":
-                    for block in entry.get("message", {}).get("content", []):
-                        if block.get("type") == "text":
-                            return block.get("text", "")
+        with open(transcript_path, "rb") as f:
+            size = f.seek(0, 2)
+            window = tail_bytes
+            # Read backwards from the end, widening the window until a response turns up
+            while True:
+                start = max(0, size - window)
+                f.seek(start)
+                lines = f.read().split(b"\n")
+                if start > 0:
+                    lines = lines[1:]  # Likely cut off mid-line
+                for line in reversed(lines):
+                    if line.strip():
+                        entry = _loads(line)
+                        if entry.get("type") == "assistant":
+                            for block in entry.get("message", {}).get("content", []):
+                                if block.get("type") == "text":
+                                    return block.get("text", "")
+                if start == 0:
+                    break
+                window *= 4
     except Exception:
         pass
     return ""
 
 
-def analyze_session(session_path: Path) -> list:
-    """Find Stop events missing AssistantResponse in a session."""
-    events = []
-    with open(session_path) as f:
-        for line in f:
-            if line.strip():
-                events.append(json.loads(line))
+def read_events(session_path: Path) -> list:
+    """Parse every event in a session file from one read of its bytes."""
+    return [_loads(line) for line in session_path.read_bytes().splitlines() if line.strip()]
+
+
+def analyze_session(session_path: Path) -> tuple:
+    """
+    Find Stop events missing AssistantResponse in a session.
+
+    Returns (events, missing) so repair_session can reuse the parsed events.
+    """
+    events = read_events(session_path)
 
     missing = []
     i = 0
@@ -64,23 +102,18 @@ def analyze_session(session_path: Path) -> list:
                 })
         i += 1
 
-    return missing
+    return events, missing
 
 
-def repair_session(session_path: Path, dry_run: bool = True) -> dict:
-    """Repair a session by adding missing AssistantResponse events."""
-    missing = analyze_session(session_path)
+def repair_session(session_path: Path, events: list, missing: list, dry_run: bool = True) -> dict:
+    """Repair a session by adding missing AssistantResponse events.
 
+    Takes the (events, missing) pair from analyze_session(); events is
+    modified in place.
+    """
     if not missing:
         return {"session": session_path.stem, "missing": 0, "repaired": 0, "failed": 0, "skipped": 0}
 
-    # Read all events
-    events = []
-    with open(session_path) as f:
-        for line in f:
-            if line.strip():
-                events.append(json.loads(line))
-
     repaired = 0
     failed = 0
     skipped = 0
@@ -191,10 +224,10 @@ def main():
     total_skipped = 0
 
     for session_path in sorted(session_files):
-        missing = analyze_session(session_path)
+        events, missing = analyze_session(session_path)
         if missing:
             print(f"\n{session_path.stem[:8]}... ({len(missing)} missing)")
-            result = repair_session(session_path, dry_run=args.dry_run)
+            result = repair_session(session_path, events, missing, dry_run=args.dry_run)
             total_missing += result["missing"]
             total_repaired += result["repaired"]
             total_failed += result["failed"]